@@ -0,0 +1,400 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from distanceMatrix import DEPOT_ID
+from routeHeuristics import RoutingData, savings_routes
+
+# Cost of leaving a customer unserved, dominates any route distance
+UNASSIGNED_PENALTY = 1e6
+
+# Adaptive weights: score for new best / improved current / accepted, and reaction rate
+SCORES = (33, 9, 13)
+REACTION = 0.1
+SEGMENT_LENGTH = 50
+
+# Share of customers removed per destroy step
+DESTROY_RANGE = (0.1, 0.4)
+
+
+class RouteState:
+    # Cached forward arrival times, backward latest arrivals and load of one
+    # route, so an insertion can be checked in O(1)
+    def __init__(self, data, route):
+        self.route = route
+        self.refresh(data)
+
+    def refresh(self, data):
+        route = self.route
+        m = len(route)
+        self.load = data.demand[route].sum() if m else 0.0
+        self.arrival = np.empty(m)
+        self.latest = np.empty(m)
+        clock, previous = data.start[0], 0
+        for p, n in enumerate(route):
+            clock = max(data.start[n], clock + data.travel[previous, n])
+            self.arrival[p] = clock
+            previous = n
+        limit = math.inf
+        for p in range(m - 1, -1, -1):
+            n = route[p]
+            limit = min(data.end[n], limit)
+            self.latest[p] = limit
+            if p:
+                limit = limit - data.travel[route[p - 1], n]
+        path = [0] + route + [0]
+        self.distance = float(data.distance[path[:-1], path[1:]].sum()) if m else 0.0
+
+    def feasible(self, data):
+        return self.load <= data.capacity + 1e-9 and bool(np.all(self.arrival <= data.end[self.route] + 1e-9))
+
+    def insertion_costs(self, data, u):
+        # Distance delta of inserting u at every position, inf where infeasible
+        if self.load + data.demand[u] > data.capacity + 1e-9:
+            return np.full(len(self.route) + 1, np.inf)
+        route = np.asarray(self.route, dtype=int)
+        prev = np.concatenate(([0], route))
+        nxt = np.concatenate((route, [0]))
+        prev_time = np.concatenate(([data.start[0]], self.arrival))
+        arrival_u = np.maximum(data.start[u], prev_time + data.travel[prev, u])
+        ok = arrival_u <= data.end[u] + 1e-9
+        if len(route):
+            next_arrival = np.maximum(data.start[route], arrival_u[:-1] + data.travel[u, route])
+            ok[:-1] &= next_arrival <= self.latest + 1e-9
+        delta = data.distance[prev, u] + data.distance[u, nxt] - data.distance[prev, nxt]
+        return np.where(ok, delta, np.inf)
+
+
+class Solution:
+    def __init__(self, data, routes, unassigned=()):
+        self.states = [RouteState(data, list(route)) for route in routes]
+        while len(self.states) < data.num_vehicles:
+            self.states.append(RouteState(data, []))
+        self.unassigned = set(unassigned)
+
+    def copy(self):
+        clone = Solution.__new__(Solution)
+        clone.states = []
+        for state in self.states:
+            copy = RouteState.__new__(RouteState)
+            copy.route = list(state.route)
+            copy.load, copy.distance = state.load, state.distance
+            copy.arrival, copy.latest = state.arrival.copy(), state.latest.copy()
+            clone.states.append(copy)
+        clone.unassigned = set(self.unassigned)
+        return clone
+
+    @property
+    def distance(self):
+        return sum(state.distance for state in self.states)
+
+    @property
+    def cost(self):
+        return self.distance + UNASSIGNED_PENALTY * len(self.unassigned)
+
+    def routes(self):
+        return [state.route for state in self.states]
+
+
+class ALNSSolver:
+    # Adaptive large neighbourhood search over RoutingData. Destroy/repair
+    # operators are picked by adaptive roulette weights, candidates are
+    # accepted by simulated annealing, and each new best is polished with
+    # relocate / exchange / 2-opt / or-opt local search. The best solution
+    # only ever improves, so a longer time_limit never hurts.
+    def __init__(self, data, seed=None):
+        self.data = data
+        self.rng = random.Random(seed)
+        self.destroy_operators = [self.random_removal, self.worst_removal, self.related_removal]
+        self.repair_operators = [self.greedy_insertion, self.regret_insertion]
+        self.history = []
+        self.iterations = 0
+
+    # Destroy operators: return the removed customers
+    def random_removal(self, solution, count):
+        served = [n for state in solution.states for n in state.route]
+        return self.rng.sample(served, min(count, len(served)))
+
+    def worst_removal(self, solution, count):
+        distance = self.data.distance
+        saving = []
+        for state in solution.states:
+            path = [0] + state.route + [0]
+            for p, n in enumerate(state.route, start=1):
+                gain = distance[path[p - 1], n] + distance[n, path[p + 1]] - distance[path[p - 1], path[p + 1]]
+                saving.append((gain * (1 + 0.2 * self.rng.random()), n))
+        saving.sort(reverse=True)
+        return [n for _, n in saving[:count]]
+
+    def related_removal(self, solution, count):
+        # Shaw removal: a random seed customer plus those closest in space and time
+        served = [n for state in solution.states for n in state.route]
+        if not served:
+            return []
+        seed = self.rng.choice(served)
+        served = np.array(served)
+        relatedness = (self.data.distance[seed, served] / (self.data.distance.max() or 1)
+                       + np.abs(self.data.start[seed] - self.data.start[served]) / (self.data.end.max() or 1))
+        return [int(n) for n in served[np.argsort(relatedness)[:count]]]
+
+    def remove(self, solution, customers):
+        customers = set(customers)
+        for state in solution.states:
+            if customers.intersection(state.route):
+                # On a sparse arc set the gap left behind may not be drivable;
+                # the customer after such a gap goes too and is reinserted by the repair
+                route, previous = [], 0
+                for n in state.route:
+                    if n in customers or math.isinf(self.data.travel[previous, n]):
+                        customers.add(n)
+                        continue
+                    route.append(n)
+                    previous = n
+                state.route = route
+                state.refresh(self.data)
+        solution.unassigned |= customers
+
+    # Repair operators
+    def best_insertions(self, solution, u):
+        # (delta, route index, position) of the cheapest and second-cheapest feasible insertions
+        best = [(math.inf, None, None), (math.inf, None, None)]
+        tried_empty = False
+        for r, state in enumerate(solution.states):
+            if not state.route:
+                if tried_empty:
+                    continue
+                tried_empty = True
+            costs = state.insertion_costs(self.data, u)
+            p = int(np.argmin(costs))
+            if costs[p] < best[0][0]:
+                best = [(costs[p], r, p), best[0]]
+            elif costs[p] < best[1][0]:
+                best[1] = (costs[p], r, p)
+        return best
+
+    def insert(self, solution, u, r, p):
+        state = solution.states[r]
+        state.route.insert(p, u)
+        state.refresh(self.data)
+        solution.unassigned.discard(u)
+
+    def greedy_insertion(self, solution):
+        pending = list(solution.unassigned)
+        self.rng.shuffle(pending)
+        for u in pending:
+            (delta, r, p), _ = self.best_insertions(solution, u)
+            if r is not None:
+                self.insert(solution, u, r, p)
+
+    def regret_insertion(self, solution):
+        # Insert the customer that would lose most by waiting first. Best
+        # positions are cached per (customer, route) and only the route that
+        # changed is re-evaluated after each insertion.
+        def route_best(state, u):
+            costs = state.insertion_costs(self.data, u)
+            p = int(np.argmin(costs))
+            return costs[p], p
+
+        pending = list(solution.unassigned)
+        table = {u: [route_best(state, u) for state in solution.states] for u in pending}
+        while pending:
+            choice, choice_regret = None, -math.inf
+            for u in pending:
+                options = []
+                empty_seen = False
+                for r, (cost, p) in enumerate(table[u]):
+                    # Empty routes are interchangeable, count only one of them
+                    if not solution.states[r].route:
+                        if empty_seen:
+                            continue
+                        empty_seen = True
+                    options.append((cost, r, p))
+                options.sort()
+                if not options or options[0][0] == math.inf:
+                    continue
+                second = options[1][0] if len(options) > 1 and options[1][0] < math.inf else UNASSIGNED_PENALTY
+                regret = second - options[0][0]
+                if regret > choice_regret:
+                    choice, choice_regret = (u, options[0][1], options[0][2]), regret
+            if choice is None:
+                break
+            u, r, p = choice
+            self.insert(solution, u, r, p)
+            pending.remove(u)
+            for v in pending:
+                table[v][r] = route_best(solution.states[r], v)
+
+    # Local search
+    def try_route(self, route):
+        state = RouteState(self.data, route)
+        return state if state.feasible(self.data) else None
+
+    def two_opt(self, state):
+        # The 4-arc delta only screens moves: on directed (road) matrices the
+        # reversed segment's own arcs change cost too, so the full route
+        # distance decides
+        route = state.route
+        distance = self.data.distance
+        path = [0] + route + [0]
+        for a in range(len(route) - 1):
+            for b in range(a + 1, len(route)):
+                delta = (distance[path[a], path[b + 1]] + distance[path[a + 1], path[b + 2]]
+                         - distance[path[a], path[a + 1]] - distance[path[b + 1], path[b + 2]])
+                if delta < -1e-9:
+                    candidate = self.try_route(route[:a] + route[a:b + 1][::-1] + route[b + 1:])
+                    if candidate is not None and candidate.distance < state.distance - 1e-9:
+                        return candidate
+        return None
+
+    def or_opt(self, state):
+        # Move a segment of 1-3 customers elsewhere in the same route
+        route = state.route
+        for length in (1, 2, 3):
+            for a in range(len(route) - length + 1):
+                segment = route[a:a + length]
+                rest = route[:a] + route[a + length:]
+                for p in range(len(rest) + 1):
+                    if p == a:
+                        continue
+                    candidate_route = rest[:p] + segment + rest[p:]
+                    path = [0] + candidate_route + [0]
+                    if self.data.distance[path[:-1], path[1:]].sum() < state.distance - 1e-9:
+                        candidate = self.try_route(candidate_route)
+                        if candidate is not None:
+                            return candidate
+        return None
+
+    def relocate(self, solution):
+        # Move one customer to its best position in another route
+        distance = self.data.distance
+        for r, state in enumerate(solution.states):
+            path = [0] + state.route + [0]
+            for p, u in enumerate(state.route):
+                if math.isinf(self.data.travel[path[p], path[p + 2]]):
+                    continue
+                gain = distance[path[p], u] + distance[u, path[p + 2]] - distance[path[p], path[p + 2]]
+                for s, other in enumerate(solution.states):
+                    if s == r:
+                        continue
+                    costs = other.insertion_costs(self.data, u)
+                    q = int(np.argmin(costs))
+                    if costs[q] < gain - 1e-9:
+                        state.route.pop(p)
+                        state.refresh(self.data)
+                        self.insert(solution, u, s, q)
+                        return True
+        return False
+
+    def exchange(self, solution):
+        # Swap two customers between routes
+        for r, state in enumerate(solution.states):
+            for s in range(r + 1, len(solution.states)):
+                other = solution.states[s]
+                for p, u in enumerate(state.route):
+                    for q, v in enumerate(other.route):
+                        first = state.route[:p] + [v] + state.route[p + 1:]
+                        second = other.route[:q] + [u] + other.route[q + 1:]
+                        path_a, path_b = [0] + first + [0], [0] + second + [0]
+                        new_distance = (self.data.distance[path_a[:-1], path_a[1:]].sum()
+                                        + self.data.distance[path_b[:-1], path_b[1:]].sum())
+                        if new_distance < state.distance + other.distance - 1e-9:
+                            a, b = self.try_route(first), self.try_route(second)
+                            if a is not None and b is not None:
+                                solution.states[r], solution.states[s] = a, b
+                                return True
+        return False
+
+    def local_search(self, solution, deadline):
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for r, state in enumerate(solution.states):
+                for move in (self.two_opt, self.or_opt):
+                    candidate = move(state)
+                    while candidate is not None:
+                        solution.states[r] = state = candidate
+                        improved = True
+                        if time.perf_counter() >= deadline:
+                            break
+                        candidate = move(state)
+            improved = self.relocate(solution) or self.exchange(solution) or improved
+        return solution
+
+    def select(self, weights):
+        return self.rng.choices(range(len(weights)), weights=weights)[0]
+
+    def solve(self, time_limit=10.0, initial_routes=None, until_complete=False):
+        # With until_complete, stop at the first solution that serves every customer
+        data = self.data
+        solve_start = time.perf_counter()
+        deadline = solve_start + time_limit
+
+        if initial_routes is None:
+            initial_routes = savings_routes(data)
+        routes = sorted(initial_routes, key=len, reverse=True)
+        current = Solution(data, routes[:data.num_vehicles], [n for route in routes[data.num_vehicles:] for n in route])
+        self.repair_operators[0](current)
+        current = self.local_search(current, deadline)
+        best = current.copy()
+        self.history = [(time.perf_counter() - solve_start, best.cost)]
+        if until_complete and not best.unassigned:
+            return best
+
+        n = len(data.nodes) - 1
+        destroy_weights = [1.0] * len(self.destroy_operators)
+        repair_weights = [1.0] * len(self.repair_operators)
+        destroy_scores = [0.0] * len(self.destroy_operators)
+        repair_scores = [0.0] * len(self.repair_operators)
+        destroy_uses = [0] * len(self.destroy_operators)
+        repair_uses = [0] * len(self.repair_operators)
+        start_temperature = 0.05 * best.distance / max(n, 1) + 1e-9
+
+        while time.perf_counter() < deadline and n > 0:
+            self.iterations += 1
+            d, r = self.select(destroy_weights), self.select(repair_weights)
+            candidate = current.copy()
+            count = max(1, int(n * self.rng.uniform(*DESTROY_RANGE)))
+            self.remove(candidate, self.destroy_operators[d](candidate, count))
+            self.repair_operators[r](candidate)
+
+            # Simulated annealing, cooling linearly to zero at the deadline
+            remaining = max(0.0, (deadline - time.perf_counter()) / time_limit)
+            temperature = start_temperature * remaining
+            score = 0
+            if candidate.cost < best.cost - 1e-9:
+                candidate = self.local_search(candidate, deadline)
+                best, current, score = candidate.copy(), candidate, SCORES[0]
+                self.history.append((time.perf_counter() - solve_start, best.cost))
+                if until_complete and not best.unassigned:
+                    return best
+            elif candidate.cost < current.cost - 1e-9:
+                current, score = candidate, SCORES[1]
+            elif temperature > 0 and self.rng.random() < math.exp((current.cost - candidate.cost) / temperature):
+                current, score = candidate, SCORES[2]
+
+            destroy_scores[d] += score
+            repair_scores[r] += score
+            destroy_uses[d] += 1
+            repair_uses[r] += 1
+            if self.iterations % SEGMENT_LENGTH == 0:
+                for weights, scores, uses in ((destroy_weights, destroy_scores, destroy_uses),
+                                              (repair_weights, repair_scores, repair_uses)):
+                    for o in range(len(weights)):
+                        if uses[o]:
+                            weights[o] = (1 - REACTION) * weights[o] + REACTION * scores[o] / uses[o]
+                        weights[o] = max(weights[o], 0.05)
+                        scores[o], uses[o] = 0.0, 0
+
+        return best
+
+
+def solve_alns(vrp, time_limit=10.0, seed=None, until_complete=False):
+    # Returns (routes in the plot_routes shape, total distance, unserved customer IDs)
+    data = RoutingData(vrp)
+    best = ALNSSolver(data, seed).solve(time_limit, until_complete=until_complete)
+    routes = []
+    for route in data.to_ids(best.routes()):
+        routes.append([(i, j) for i, j in zip(route, route[1:] + [DEPOT_ID])])
+    return routes, best.distance, [data.nodes[n] for n in sorted(best.unassigned)]
@@ -0,0 +1,60 @@
+import numpy as np
+
+from distanceMatrix import DEPOT_ID
+
+# Rounds of window tightening / arc elimination before giving up on a fixed point
+TIGHTEN_ROUNDS = 20
+
+
+def prune_arcs(vrp):
+    # Tighten window starts and drop customer-to-customer arcs no feasible route
+    # can use. Returns (arcs, time windows, report). Arcs touching the depot are
+    # always kept so every customer still has a way in and out.
+    time_windows = vrp.get_model_windows()
+    nodes = [DEPOT_ID] + list(vrp.customers)
+    travel = vrp.travel_times.sub_matrix(nodes)
+    demand = np.array([0] + [vrp.goods_for_cus[i] for i in vrp.customers], dtype=float)
+    start = np.array([vrp.depot_window[0]] + [time_windows[i][0] for i in vrp.customers], dtype=float)
+    end = np.array([vrp.depot_window[1]] + [time_windows[i][1] for i in vrp.customers], dtype=float)
+    n = len(nodes)
+
+    customer_pair = np.ones((n, n), dtype=bool)
+    customer_pair[0, :] = customer_pair[:, 0] = False
+    np.fill_diagonal(customer_pair, False)
+
+    # Two customers whose goods do not fit one vehicle never share a route
+    capacity_cut = customer_pair & (demand[:, None] + demand[None, :] > vrp.vehicle_capacity)
+    allowed = ~np.eye(n, dtype=bool) & ~capacity_cut
+
+    original_start = start.copy()
+    time_cut = np.zeros((n, n), dtype=bool)
+    for _ in range(TIGHTEN_ROUNDS):
+        # Leaving i at its earliest start already misses the end of j's window
+        late = customer_pair & allowed & (start[:, None] + travel > end[None, :] + 1e-9)
+        time_cut |= late
+        allowed &= ~late
+
+        # A customer cannot be reached earlier than its quickest remaining predecessor allows
+        reach = np.where(allowed, start[:, None] + travel, np.inf).min(axis=0)
+        tightened = np.maximum(start, np.minimum(end, reach))
+        tightened[0] = start[0]
+        if np.array_equal(tightened, start) and not late.any():
+            break
+        start = tightened
+
+    position = {i: p for p, i in enumerate(nodes)}
+    arcs = [(i, j) for i, j in vrp.arcs if allowed[position[i], position[j]]]
+    windows = {i: (float(start[p]), time_windows[i][1]) for p, i in enumerate(nodes) if i != DEPOT_ID}
+
+    removed = len(vrp.arcs) - len(arcs)
+    copies = 1 if vrp.formulation == 'two_index' else vrp.num_vehicles
+    report = {
+        'arcs_removed': removed,
+        'capacity_arcs': int(capacity_cut.sum()),
+        'time_window_arcs': int((time_cut & ~capacity_cut).sum()),
+        'windows_tightened': int((start > original_start).sum()),
+        'variables_removed': removed * copies,
+        # Every removed customer-to-customer arc takes its load row and its time row along
+        'constraints_removed': 2 * removed * copies,
+    }
+    return arcs, windows, report
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from alnsSolver import solve_alns
+from instanceLoader import instance_from_record, read_records
+from recordStore import RecordStore, record_hash
+from solveRouteClass import VehicleRoutingProblemSolver
+
+BATCH_BACKENDS = ('mip', 'alns')
+
+def build_instance(record, seed, options):
+    # The request logs only carry counts and windows; instance_from_record draws
+    # locations and goods from the per-job seed when they are missing
+    return VehicleRoutingProblemSolver.from_data(**instance_from_record(record, seed), **options)
+
+
+def solve_job(job):
+    # Runs in a worker process; always returns a result record, never raises.
+    # time_limit covers the whole job: the solver gets what instance and model
+    # building left of it.
+    job_id, source, record, backend, time_limit, seed, options = job
+    result = {'job': job_id, 'source': source, 'instance': record_hash(record)}
+    job_start = time.perf_counter()
+
+    def time_left():
+        remaining = time_limit - (time.perf_counter() - job_start)
+        if remaining <= 0:
+            raise TimeoutError(f"the {time_limit:g}s time limit ran out before the solve")
+        return remaining
+
+    try:
+        vrp = build_instance(record, seed, options)
+        if backend == 'alns':
+            routes, objective, unassigned = solve_alns(vrp, time_left(), seed)
+            status = 'feasible' if not unassigned else 'partial'
+        elif backend == 'mip':
+            vrp.build_model()
+            routes = vrp.solve(time_limit=time_left())
+            objective, unassigned = vrp.objective, []
+            status = vrp.solve_status
+            result.update({'gap': vrp.mip_gap, 'bound': vrp.bound})
+        else:
+            raise ValueError(f"Unknown batch backend '{backend}', use one of {BATCH_BACKENDS}")
+        result.update({
+            'status': status,
+            'objective': objective,
+            'routes': [[i for i, _ in route] for route in routes] if routes is not None else None,
+            'unassigned': unassigned,
+        })
+    except TimeoutError as error:
+        result.update({'status': 'no_solution', 'objective': None, 'routes': None, 'error': str(error)})
+    except Exception as error:
+        result.update({'status': 'error', 'error': f"{type(error).__name__}: {error}",
+                       'traceback': traceback.format_exc()})
+    result['solve_time'] = time.perf_counter() - job_start
+    return result
+
+
+def read_requests(path):
+    # Requests from a record store directory, streamed in the order they came
+    # in, or from a JSON/JSONL request log
+    if os.path.isdir(path):
+        return (record['data'] for record in RecordStore(path).replay('instance'))
+    return read_records(path)
+
+
+def iter_jobs(paths, backend, time_limit, seed, options):
+    job_id = 0
+    for path in paths:
+        for record in read_requests(path):
+            yield job_id, path, record, backend, time_limit, seed + job_id, options
+            job_id += 1
+
+
+def solve_batch(paths, output, backend='alns', workers=None, time_limit=10.0, seed=0, store=None, **options):
+    # Solve every request in `paths` on a process pool and append one result
+    # line per job to `output` as soon as it finishes, and to the record store
+    # in `store` if given. At most two jobs per worker are queued, so memory
+    # stays flat however long the logs are.
+    if backend not in BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch backend '{backend}', use one of {BATCH_BACKENDS}")
+    workers = workers or os.cpu_count() or 1
+    jobs = iter_jobs(paths, backend, time_limit, seed, options)
+    summary = {'jobs': 0, 'errors': 0}
+    records = RecordStore(store) if store is not None else None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output, 'a') as out:
+        pending = set()
+        for job in jobs:
+            pending.add(executor.submit(solve_job, job))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write_results(done, out, summary, records)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write_results(done, out, summary, records)
+    return summary
+
+
+def write_results(futures, out, summary, records=None):
+    for future in futures:
+        result = future.result()
+        out.write(json.dumps(result) + '\n')
+        if records is not None:
+            records.append_result(result['instance'], result)
+        summary['jobs'] += 1
+        summary['errors'] += result['status'] == 'error'
+    out.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve logged routing requests in parallel")
+    parser.add_argument('inputs', nargs='+', help="record store directories or request logs (customersAPI.log, input_data.json, ...)")
+    parser.add_argument('-o', '--output', default='batch_results.jsonl')
+    parser.add_argument('--store', default=None, help="also append the results to this record store")
+    parser.add_argument('--backend', choices=BATCH_BACKENDS, default='alns')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=10.0, help="seconds per job, instance and model building included")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--formulation', default='two_index')
+    parser.add_argument('--assembly', default='matrix')
+    parser.add_argument('--mip-rel-gap', type=float, default=None, help="stop the MIP at this relative gap")
+    parser.add_argument('--threads', type=int, default=None, help="solver threads per job; only with --assembly pyomo, scipy's milp has no thread option")
+    args = parser.parse_args()
+
+    batch_start = time.perf_counter()
+    summary = solve_batch(args.inputs, args.output, args.backend, args.workers, args.time_limit, args.seed, args.store,
+                          formulation=args.formulation, assembly=args.assembly,
+                          mip_rel_gap=args.mip_rel_gap, threads=args.threads)
+    print(f"Solved {summary['jobs']} jobs ({summary['errors']} errors) in {time.perf_counter() - batch_start:.1f}s -> {args.output}")
@@ -0,0 +1,285 @@
+import os
+
+# Plots are drawn off-screen, a benchmark never waits on a window
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pyomo.version
+import scipy
+
+from alnsSolver import solve_alns
+from cutLoop import CutLoop
+from instanceLoader import instance_from_record
+from solveMetrics import peak_rss_mb
+from solveRouteClass import VehicleRoutingProblemSolver
+
+# (customers, vehicles, goods) spanning the readme's target ranges
+BENCHMARK_SIZES = ((5, 3, 60), (10, 3, 60), (20, 5, 80), (50, 8, 100), (100, 10, 100))
+
+# Spare room over the average demand per vehicle when sizing the capacity
+CAPACITY_SLACK = 1.25
+
+# Phases timed for every run, in order; missing ones are reported empty
+PHASES = ('generate', 'setup', 'build', 'solve')
+
+# Slower than the baseline by more than this fraction counts as a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def generate_instance(num_customers, num_vehicles, num_goods, seed):
+    # from_data() keyword arguments for a reproducible instance. Locations and
+    # goods are drawn by instance_from_record from the same seed (the same
+    # draws the solver constructors make after random.seed(seed)); windows
+    # open between 08:00 and 14:00 and stay open 2 to 6 hours.
+    rng = random.Random(f"windows-{seed}")
+    windows = {}
+    for i in range(1, num_customers + 1):
+        start = rng.randrange(8 * 60, 14 * 60, 15)
+        windows[i] = (start, start + rng.randrange(2 * 60, 6 * 60 + 1, 15))
+    record = {
+        'num_customers': num_customers,
+        'num_vehicles': num_vehicles,
+        'num_goods': num_goods,
+        'time_windows': windows,
+        # Goods go up to num_goods - 1, far past the default capacity of 10
+        'vehicle_capacity': num_goods,
+    }
+    instance = instance_from_record(record, seed)
+    demand = sum(instance['goods_for_cus'].values())
+    instance['vehicle_capacity'] = max(max(instance['goods_for_cus'].values()),
+                                       math.ceil(demand / num_vehicles * CAPACITY_SLACK))
+    return instance
+
+
+def class_case(formulation, assembly, solver='highs'):
+    def run(instance, time_limit, seed, timings):
+        start = time.perf_counter()
+        vrp = VehicleRoutingProblemSolver.from_data(**instance, formulation=formulation, assembly=assembly, solver=solver)
+        timings['setup'] = time.perf_counter() - start
+        start = time.perf_counter()
+        vrp.build_model()
+        timings['build'] = time.perf_counter() - start
+        start = time.perf_counter()
+        routes = vrp.solve(time_limit=time_limit)
+        timings['solve'] = time.perf_counter() - start
+        # The solver's own phase split and statistics go into the JSON report
+        # overhead: time around the solver (model hand-over, solution read-back,
+        # process start-up), to compare the in-process and shell interfaces
+        return {'status': vrp.solve_status, 'objective': vrp.objective, 'gap': vrp.mip_gap, 'routes': routes,
+                'nodes': vrp.metrics.solver.get('nodes'), 'interface': vrp.metrics.solver.get('interface'),
+                'overhead': vrp.metrics.overhead(), 'phases': vrp.metrics.phases}
+    return run
+
+
+def cuts_case(instance, time_limit, seed, timings):
+    start = time.perf_counter()
+    vrp = VehicleRoutingProblemSolver.from_data(**instance, formulation='two_index', assembly='matrix')
+    timings['setup'] = time.perf_counter() - start
+    start = time.perf_counter()
+    loop = CutLoop(vrp)
+    timings['build'] = time.perf_counter() - start
+    start = time.perf_counter()
+    routes = loop.solve(time_limit)
+    timings['solve'] = time.perf_counter() - start
+    return {'status': loop.status, 'objective': loop.objective, 'gap': 0.0 if loop.status == 'optimal' else None, 'routes': routes,
+            'iterations': len(loop.stats)}
+
+
+def alns_case(instance, time_limit, seed, timings):
+    start = time.perf_counter()
+    vrp = VehicleRoutingProblemSolver.from_data(**instance)
+    timings['setup'] = time.perf_counter() - start
+    start = time.perf_counter()
+    routes, objective, unassigned = solve_alns(vrp, time_limit, seed)
+    timings['solve'] = time.perf_counter() - start
+    return {'status': 'feasible' if not unassigned else 'partial',
+            'objective': objective, 'gap': None, 'routes': routes}
+
+
+def solve_route_case(instance, time_limit, seed, timings):
+    # The functional solver on the same instance. CBC gets the time limit; a run
+    # it stops short returns no routes. It writes to the record store and plots,
+    # so it runs in a scratch directory; its errors (e.g. no CBC) are re-raised
+    # and reported as 'error'.
+    import solveRoute
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            start = time.perf_counter()
+            routes, objective = solveRoute.solve_vehicle_routing_problem(
+                None, None, None, instance=instance, time_limit=time_limit, raise_errors=True)
+            timings['solve'] = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    return {'status': 'optimal' if routes is not None else 'no_solution',
+            'objective': objective, 'gap': None, 'routes': routes}
+
+
+BENCHMARK_CASES = {
+    'three_index_pyomo': class_case('three_index', 'pyomo'),
+    'three_index_cbc': class_case('three_index', 'pyomo', 'cbc'),
+    'three_index_matrix': class_case('three_index', 'matrix'),
+    'two_index_pyomo': class_case('two_index', 'pyomo'),
+    'two_index_cbc': class_case('two_index', 'pyomo', 'cbc'),
+    'two_index_matrix': class_case('two_index', 'matrix'),
+    'cuts': cuts_case,
+    'alns': alns_case,
+    'solveRoute': solve_route_case,
+}
+
+
+def run_case(job):
+    # Runs in a fresh worker process, so the memory peak belongs to this run
+    # alone; always returns a result row, never raises
+    case, (num_customers, num_vehicles, num_goods), repeat, seed, time_limit = job
+    row = {'case': case, 'customers': num_customers, 'vehicles': num_vehicles, 'goods': num_goods,
+           'repeat': repeat, 'seed': seed, 'time_limit': time_limit}
+    timings = {}
+    baseline_rss = peak_rss_mb()
+    run_start = time.perf_counter()
+    try:
+        start = time.perf_counter()
+        instance = generate_instance(num_customers, num_vehicles, num_goods, seed)
+        timings['generate'] = time.perf_counter() - start
+        row['vehicle_capacity'] = instance['vehicle_capacity']
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = BENCHMARK_CASES[case](instance, time_limit, seed, timings)
+        routes = result.pop('routes')
+        row.update(result)
+        row['vehicles_used'] = sum(1 for route in routes if route) if routes is not None else None
+    except Exception as error:
+        row.update({'status': 'error', 'objective': None, 'gap': None, 'error': f"{type(error).__name__}: {error}"})
+    row['total'] = time.perf_counter() - run_start
+    row.update({f"{phase}_time": timings.get(phase) for phase in PHASES})
+    row['peak_rss_mb'] = peak_rss_mb()
+    row['rss_growth_mb'] = row['peak_rss_mb'] - baseline_rss
+    return row
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'scipy': scipy.__version__,
+        'pyomo': pyomo.version.version,
+    }
+
+
+def run_benchmark(sizes=BENCHMARK_SIZES, cases=tuple(BENCHMARK_CASES), repeats=1, time_limit=60.0, seed=0):
+    # One run per (size, case, repeat). Every run gets its own process, one at
+    # a time, so runs do not compete for cores or share warmed-up caches. The
+    # instance seed depends on size and repeat only, so all cases of a size
+    # solve the same instances.
+    for case in cases:
+        if case not in BENCHMARK_CASES:
+            raise ValueError(f"Unknown benchmark case '{case}', use one of {sorted(BENCHMARK_CASES)}")
+    jobs = [(case, tuple(size), repeat, seed + 1000 * n + repeat, time_limit)
+            for n, size in enumerate(sizes) for repeat in range(repeats) for case in cases]
+    runs = []
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for row in executor.map(run_case, jobs):
+            print(f"{row['case']:>20} {row['customers']:>3}/{row['vehicles']:>2}/{row['goods']:>3} "
+                  f"#{row['repeat']}: {row['status']:<11} objective {row['objective']}, {row['total']:.2f}s, "
+                  f"{row['peak_rss_mb']:.0f} MB")
+            runs.append(row)
+    return {'environment': environment(), 'settings': {'sizes': [list(size) for size in sizes], 'cases': list(cases),
+            'repeats': repeats, 'time_limit': time_limit, 'seed': seed}, 'runs': runs}
+
+
+def write_report(report, path):
+    # <path>.json keeps everything; <path>.csv has one row per run
+    with open(f"{path}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    columns = ['case', 'customers', 'vehicles', 'goods', 'vehicle_capacity', 'repeat', 'seed', 'time_limit',
+               'status', 'objective', 'gap', 'nodes', 'vehicles_used', 'interface', 'overhead', 'total'] + [f"{phase}_time" for phase in PHASES] \
+              + ['peak_rss_mb', 'rss_growth_mb', 'error']
+    with open(f"{path}.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(report['runs'])
+
+
+def summarize(report):
+    # Median total time, best objective and highest memory peak per (case, size)
+    groups = {}
+    for row in report['runs']:
+        groups.setdefault((row['case'], row['customers'], row['vehicles'], row['goods']), []).append(row)
+    summary = {}
+    for key, rows in groups.items():
+        objectives = [row['objective'] for row in rows if row['objective'] is not None]
+        summary[key] = {
+            'total': float(numpy.median([row['total'] for row in rows])),
+            'objective': min(objectives) if objectives else None,
+            'peak_rss_mb': max(row['peak_rss_mb'] for row in rows),
+        }
+    return summary
+
+
+def compare_reports(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    # Messages for every (case, size) that got slower, worse or hungrier than
+    # the baseline report by more than `tolerance`, or lost its solution
+    before, after = summarize(baseline), summarize(current)
+    regressions = []
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        label = f"{key[0]} {key[1]}/{key[2]}/{key[3]}"
+        if new['total'] > old['total'] * (1 + tolerance):
+            regressions.append(f"{label}: {old['total']:.2f}s -> {new['total']:.2f}s")
+        if old['objective'] is not None and new['objective'] is None:
+            regressions.append(f"{label}: no solution (was {old['objective']:.2f})")
+        elif old['objective'] is not None and new['objective'] > old['objective'] * (1 + 1e-6) + 1e-6:
+            regressions.append(f"{label}: objective {old['objective']:.2f} -> {new['objective']:.2f}")
+        if new['peak_rss_mb'] > old['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{label}: {old['peak_rss_mb']:.0f} MB -> {new['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def parse_size(text):
+    customers, vehicles, goods = (int(part) for part in text.split('/'))
+    return customers, vehicles, goods
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the solvers on seeded instances")
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=BENCHMARK_SIZES,
+                        help="customers/vehicles/goods, e.g. 20/5/80")
+    parser.add_argument('--cases', nargs='+', choices=sorted(BENCHMARK_CASES), default=list(BENCHMARK_CASES))
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--time-limit', type=float, default=60.0, help="seconds per solve")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='benchmark_report', help="writes <output>.json and <output>.csv")
+    parser.add_argument('--baseline', help="earlier <output>.json to check for regressions")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.cases, args.repeats, args.time_limit, args.seed)
+    write_report(report, args.output)
+    print(f"Wrote {args.output}.json and {args.output}.csv")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(json.load(f), report)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,135 @@
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from alnsSolver import solve_alns
+from distanceMatrix import DEPOT_ID
+
+CLUSTER_METHODS = ('sweep', 'kmeans')
+BACKENDS = ('mip', 'alns')
+KMEANS_ITERATIONS = 20
+
+
+def sweep_clusters(depot, customer_locations, goods_for_cus, capacity):
+    # Sort customers by polar angle around the depot and cut a new cluster
+    # whenever the next customer would overload the vehicle
+    ids = list(customer_locations)
+    points = np.array([customer_locations[i] for i in ids], dtype=float)
+    angles = np.arctan2(points[:, 1] - depot[1], points[:, 0] - depot[0])
+
+    # Start the sweep after the widest empty sector so clusters do not straddle it
+    order = np.argsort(angles)
+    gaps = np.diff(np.concatenate((angles[order], [angles[order[0]] + 2 * math.pi])))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+
+    clusters, current, load = [], [], 0
+    for n in order:
+        i = ids[n]
+        if current and load + goods_for_cus[i] > capacity:
+            clusters.append(current)
+            current, load = [], 0
+        current.append(i)
+        load += goods_for_cus[i]
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def capacitated_kmeans(depot, customer_locations, goods_for_cus, capacity, num_clusters):
+    # k-means where each assignment respects the remaining cluster capacity,
+    # seeded with the centroids of a sweep partition
+    ids = list(customer_locations)
+    points = np.array([customer_locations[i] for i in ids], dtype=float)
+    demand = np.array([goods_for_cus[i] for i in ids], dtype=float)
+
+    seeds = sweep_clusters(depot, customer_locations, goods_for_cus, capacity)
+    position = {i: n for n, i in enumerate(ids)}
+    centroids = np.array([points[[position[i] for i in cluster]].mean(axis=0) for cluster in seeds])
+    if len(centroids) < num_clusters:
+        extra = points[np.linspace(0, len(points) - 1, num_clusters - len(centroids)).astype(int)]
+        centroids = np.vstack((centroids, extra))
+    num_clusters = len(centroids)
+
+    assignment = np.full(len(ids), -1)
+    for _ in range(KMEANS_ITERATIONS):
+        distance = np.linalg.norm(points[:, None, :] - centroids[None, :, :], axis=-1)
+        remaining = np.full(num_clusters, float(capacity))
+        new_assignment = np.empty(len(ids), dtype=int)
+        # Customers with the clearest preference pick first
+        for n in np.argsort(distance.min(axis=1)):
+            choices = np.argsort(distance[n])
+            fitting = [c for c in choices if remaining[c] >= demand[n]]
+            c = fitting[0] if fitting else int(np.argmax(remaining))
+            new_assignment[n] = c
+            remaining[c] -= demand[n]
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for c in range(num_clusters):
+            members = assignment == c
+            if members.any():
+                centroids[c] = points[members].mean(axis=0)
+
+    return [[ids[n] for n in np.flatnonzero(assignment == c)] for c in range(num_clusters) if (assignment == c).any()]
+
+
+def cluster_task(vrp, members, backend, time_limit, seed):
+    # Everything a worker needs to rebuild the cluster as a one-vehicle instance
+    time_windows = vrp.get_time_windows()
+    data = {
+        'depot': vrp.depot,
+        'customer_locations': {n: vrp.customer_locations[i] for n, i in enumerate(members, start=1)},
+        'goods_for_cus': {n: vrp.goods_for_cus[i] for n, i in enumerate(members, start=1)},
+        'time_windows': {n: time_windows[i] for n, i in enumerate(members, start=1)},
+        'num_vehicles': 1,
+        'vehicle_capacity': vrp.vehicle_capacity,
+    }
+    options = {'metric': vrp.metric, 'road_network': vrp.road_network, 'formulation': 'two_index', 'assembly': vrp.assembly}
+    return type(vrp), data, options, members, backend, time_limit, seed
+
+
+def solve_cluster(task):
+    # Runs in a worker process: a TSP with time windows for one cluster
+    solver_class, data, options, members, backend, time_limit, seed = task
+    sub = solver_class.from_data(**data, **options)
+    routes = None
+    if backend == 'mip':
+        sub.build_model()
+        routes = sub.solve(time_limit=time_limit)
+        unassigned = []
+    if routes is None:
+        # No solution found inside the limit (an incumbent stopped by it is kept): route the cluster heuristically
+        routes, _, unassigned = solve_alns(sub, time_limit, seed)
+
+    label = {DEPOT_ID: DEPOT_ID, **{n: i for n, i in enumerate(members, start=1)}}
+    route = [(label[i], label[j]) for i, j in routes[0]]
+    return route, [label[i] for i in unassigned]
+
+
+def solve_clustered(vrp, method='sweep', backend='mip', workers=None, time_limit=10.0, seed=None):
+    # Cluster-first, route-second. Returns (routes, total distance, unserved customer IDs)
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown cluster method '{method}', use one of {CLUSTER_METHODS}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cluster backend '{backend}', use one of {BACKENDS}")
+
+    vrp.get_time_windows()
+    if method == 'sweep':
+        clusters = sweep_clusters(vrp.depot, vrp.customer_locations, vrp.goods_for_cus, vrp.vehicle_capacity)
+    else:
+        needed = math.ceil(sum(vrp.goods_for_cus.values()) / vrp.vehicle_capacity)
+        clusters = capacitated_kmeans(vrp.depot, vrp.customer_locations, vrp.goods_for_cus, vrp.vehicle_capacity, max(needed, vrp.num_vehicles))
+    if len(clusters) > vrp.num_vehicles:
+        logging.error("Cluster solve: %d clusters need more than the %d vehicles available", len(clusters), vrp.num_vehicles)
+
+    tasks = [cluster_task(vrp, members, backend, time_limit, seed) for members in clusters]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(solve_cluster, tasks))
+
+    routes = [route for route, _ in results]
+    unserved = [i for _, unassigned in results for i in unassigned]
+    routes += [[] for _ in range(vrp.num_vehicles - len(routes))]
+    total_distance = sum(vrp.distances[DEPOT_ID, route[0][0]] + sum(vrp.distances[i, j] for i, j in route) for route in routes if route)
+    return routes, total_distance, unserved
@@ -0,0 +1,236 @@
+import math
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_matrix
+
+from distanceMatrix import DEPOT_ID
+from matrixModel import VRPMatrixModel
+from routeHeuristics import RoutingData
+
+# Big-M families the cut loop leaves out and replaces with lazy cuts
+MTZ_FAMILIES = ('load_constraint', 'time_constraint')
+
+CUT_KINDS = ('subtour', 'capacity', 'path')
+
+# Share of the time limit the cut loop may use; the big-M model gets the rest
+# when the loop has not converged by then
+CUT_SHARE = 0.5
+
+
+class CutLoop:
+    # Solves the two-index routing model without the big-M load/arrival rows,
+    # whatever vrp.formulation is: the routes do not depend on which vehicle
+    # drives them, and per-vehicle copies only make the MIPs symmetric. After
+    # each MIP solve the integer solution is separated: customer cycles get
+    # subtour cuts, overloaded routes get rounded capacity cuts and routes that
+    # miss a window get an infeasible-path cut. Stops when nothing is violated.
+    def __init__(self, vrp):
+        self.vrp = vrp
+        self.data = RoutingData(vrp)
+        self.position = {i: n for n, i in enumerate(self.data.nodes)}
+
+        # The full model, big-M rows included, is the fallback (see solve)
+        self.model = VRPMatrixModel(vrp, 'two_index')
+        keep = np.ones(self.model.shape[0], dtype=bool)
+        for name in MTZ_FAMILIES:
+            if name in self.model.families:
+                start, count = self.model.families[name]
+                keep[start:start + count] = False
+
+        # Only the arc columns are left once the load/arrival rows are gone
+        columns = self.model.goods_offset
+        self.arc_id = {arc: a for a, arc in enumerate(self.model.arcs)}
+        self.c = self.model.c[:columns]
+        self.integrality = self.model.integrality[:columns]
+        self.bounds = Bounds(self.model.lower[:columns], self.model.upper[:columns])
+        self.A = self.model.A[keep][:, :columns]
+        self.row_lower = self.model.row_lower[keep]
+        self.row_upper = self.model.row_upper[keep]
+
+        self.cut_rows, self.cut_cols, self.cut_vals, self.cut_upper = [], [], [], []
+        self.stats = []
+        self.routes = None
+        self.objective = None
+        # After solve(): 'optimal', 'feasible' (stopped at a limit), 'infeasible'
+        # or 'no_solution', like VehicleRoutingProblemSolver.solve_status
+        self.status = None
+
+    def add_cut(self, arcs, rhs):
+        # sum of x over `arcs` <= rhs
+        row = len(self.cut_upper)
+        for arc in arcs:
+            a = self.arc_id.get(arc)
+            if a is None:
+                continue
+            self.cut_rows.append(row)
+            self.cut_cols.append(a)
+            self.cut_vals.append(1.0)
+        self.cut_upper.append(rhs)
+
+    def constraints(self):
+        constraints = [LinearConstraint(self.A, self.row_lower, self.row_upper)]
+        if self.cut_upper:
+            cuts = csr_matrix((self.cut_vals, (self.cut_rows, self.cut_cols)),
+                              shape=(len(self.cut_upper), len(self.c)))
+            constraints.append(LinearConstraint(cuts, -np.inf, np.array(self.cut_upper)))
+        return constraints
+
+    def successors(self, solution):
+        arcs = [arc for arc, a in self.arc_id.items() if solution[a] > 0.5]
+        firsts = [j for i, j in arcs if i == DEPOT_ID]
+        successor = {i: j for i, j in arcs if i != DEPOT_ID}
+        return firsts, successor
+
+    def inner_arcs(self, customers):
+        return [(i, j) for i in customers for j in customers if i != j]
+
+    def forward_arcs(self, path):
+        # Arcs from each stop of the path to every later one. Using len(path) - 1
+        # of them (depot arcs aside) is only possible by driving the path itself,
+        # so its cut can count them all. The depot may start several routes,
+        # only its arc into the path counts.
+        arcs = [(i, j) for a, i in enumerate(path) if i != DEPOT_ID for j in path[a + 1:]]
+        if path[0] == DEPOT_ID:
+            arcs.append((DEPOT_ID, path[1]))
+        return arcs
+
+    def vehicles_needed(self, customers):
+        demand = sum(self.vrp.goods_for_cus[i] for i in customers)
+        return max(1, math.ceil(demand / self.vrp.vehicle_capacity - 1e-9))
+
+    def infeasible_path(self, route):
+        # Shortest stretch of the route that no schedule can keep, or None.
+        # A stretch starts at the earliest time its first customer can be reached.
+        data = self.data
+        path = [0] + [self.position[i] for i in route]
+        clock = data.start[0]
+        for b in range(1, len(path)):
+            clock = max(data.start[path[b]], clock + data.travel[path[b - 1], path[b]])
+            if clock <= data.end[path[b]] + 1e-9:
+                continue
+            for a in range(b - 1, 0, -1):
+                t = max(data.start[path[a]], data.start[0] + data.travel[0, path[a]])
+                for n in range(a + 1, b + 1):
+                    t = max(data.start[path[n]], t + data.travel[path[n - 1], path[n]])
+                if t > data.end[path[b]] + 1e-9:
+                    return [data.nodes[n] for n in path[a:b + 1]]
+            return [data.nodes[n] for n in path[:b + 1]]
+        return None
+
+    def separate(self, solution):
+        # Adds the cuts violated by an integer solution; returns (routes, cut counts)
+        firsts, successor = self.successors(solution)
+        counts = dict.fromkeys(CUT_KINDS, 0)
+        routes = []
+
+        for first in firsts:
+            route, i = [], first
+            while i != DEPOT_ID:
+                route.append(i)
+                i = successor.pop(i)
+            routes.append(route)
+
+            if self.vehicles_needed(route) > 1:
+                self.add_cut(self.inner_arcs(route), len(route) - self.vehicles_needed(route))
+                counts['capacity'] += 1
+                continue
+            path = self.infeasible_path(route)
+            if path is not None:
+                self.add_cut(self.forward_arcs(path), len(path) - 2)
+                counts['path'] += 1
+
+        # Whatever is left are cycles that never touch the depot
+        while successor:
+            i, _ = next(iter(successor.items()))
+            cycle = []
+            while i in successor:
+                cycle.append(i)
+                i = successor.pop(i)
+            self.add_cut(self.inner_arcs(cycle), len(cycle) - self.vehicles_needed(cycle))
+            counts['subtour'] += 1
+
+        return routes, counts
+
+    def solve_mip(self, c, integrality, bounds, constraints, time_limit, mip_gap):
+        # One milp call, recorded in self.stats
+        options = {}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+        if mip_gap is not None:
+            options['mip_rel_gap'] = mip_gap
+        solve_start = time.perf_counter()
+        result = milp(c, integrality=integrality, bounds=bounds, constraints=constraints, options=options)
+        record = {
+            'iteration': len(self.stats) + 1,
+            'solve_time': time.perf_counter() - solve_start,
+            'rows': constraints[0].A.shape[0] + (constraints[1].A.shape[0] if len(constraints) > 1 else 0),
+            'objective': result.fun if result.x is not None else None,
+            'status': result.message,
+        }
+        self.stats.append(record)
+        return result, record
+
+    def solve(self, time_limit=None, mip_gap=None):
+        # Returns routes as ordered (i, j) arcs per vehicle, or None without a
+        # solution; self.status says which. With a time limit the loop gets
+        # CUT_SHARE of it. A loop that runs out of time keeps its last
+        # incumbent if that violates no cut, else the big-M model solves the
+        # instance with the time left.
+        loop_start = time.perf_counter()
+        loop_limit = None if time_limit is None else time_limit * CUT_SHARE
+        routes, result = None, None
+        self.status = 'no_solution'
+        while True:
+            remaining = None
+            if loop_limit is not None:
+                remaining = loop_limit - (time.perf_counter() - loop_start)
+                if remaining <= 0:
+                    break
+            result, record = self.solve_mip(self.c, self.integrality, self.bounds, self.constraints(), remaining, mip_gap)
+            if result.status == 2:
+                # The relaxation without the big-M rows has no solution, the instance has none either
+                self.status = 'infeasible'
+                break
+            if result.x is None:
+                break
+            found, counts = self.separate(result.x)
+            record.update(counts)
+            if not any(counts.values()):
+                routes, self.status = found, 'optimal' if result.status == 0 else 'feasible'
+                break
+            if result.status != 0:
+                break
+
+        if self.status == 'no_solution':
+            routes, result = self.solve_fallback(time_limit, mip_gap, loop_start)
+        if routes is None:
+            self.routes, self.objective = None, None
+            return None
+
+        routes = [[(i, j) for i, j in zip(route, route[1:] + [DEPOT_ID])] for route in routes]
+        self.routes = routes + [[] for _ in range(self.vrp.num_vehicles - len(routes))]
+        self.objective = result.fun
+        return self.routes
+
+    def solve_fallback(self, time_limit, mip_gap, loop_start):
+        # The two-index model with its big-M rows for whatever time is left;
+        # returns (routes as customer IDs, milp result) or (None, None)
+        remaining = None
+        if time_limit is not None:
+            remaining = time_limit - (time.perf_counter() - loop_start)
+            if remaining <= 0:
+                return None, None
+        model = self.model
+        result, record = self.solve_mip(model.c, model.integrality, Bounds(model.lower, model.upper),
+                                        [LinearConstraint(model.A, model.row_lower, model.row_upper)], remaining, mip_gap)
+        record['fallback'] = True
+        if result.status == 2:
+            self.status = 'infeasible'
+        if result.x is None:
+            return None, None
+        # Every big-M feasible solution passes the separation, no cuts are added
+        routes, _ = self.separate(result.x[:model.goods_offset])
+        self.status = 'optimal' if result.status == 0 else 'feasible'
+        return routes, result
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Mean earth radius, used by the haversine metric (result in kilometres)
+EARTH_RADIUS_KM = 6371.0
+
+DEPOT_ID = 0
+
+
+def euclidean_matrix(points):
+    # Pairwise straight-line distance for an (n, 2) array in one broadcast pass
+    diff = points[:, None, :] - points[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def haversine_matrix(points):
+    # Pairwise great-circle distance for an (n, 2) array of (lat, lon) in degrees
+    lat = np.radians(points[:, 0])
+    lon = np.radians(points[:, 1])
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+METRICS = {
+    'euclidean': euclidean_matrix,
+    'haversine': haversine_matrix,
+}
+
+
+class DistanceMatrix:
+    # Distances between the depot (node 0) and every customer, computed once
+    # and shared by all vehicles. Look up with matrix[i, j] using node IDs.
+    def __init__(self, depot, customer_locations, metric='euclidean'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown distance metric '{metric}', use one of {sorted(METRICS)}")
+
+        self.metric = metric
+        self.nodes = [DEPOT_ID] + list(customer_locations)
+        self.index = {node: n for n, node in enumerate(self.nodes)}
+
+        points = np.array([depot] + [customer_locations[i] for i in customer_locations], dtype=float)
+        self.matrix = METRICS[metric](points)
+
+    @classmethod
+    def from_array(cls, nodes, matrix, metric='custom'):
+        # Wrap a precomputed square matrix whose rows follow `nodes`
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.shape != (len(nodes), len(nodes)):
+            raise ValueError(f"Matrix shape {matrix.shape} does not match {len(nodes)} nodes")
+
+        distance_matrix = cls.__new__(cls)
+        distance_matrix.metric = metric
+        distance_matrix.nodes = list(nodes)
+        distance_matrix.index = {node: n for n, node in enumerate(distance_matrix.nodes)}
+        distance_matrix.matrix = matrix
+        return distance_matrix
+
+    def __getitem__(self, arc):
+        i, j = arc
+        return float(self.matrix[self.index[i], self.index[j]])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def rows(self, nodes):
+        # Row/column positions of the given node IDs
+        return np.array([self.index[node] for node in nodes], dtype=int)
+
+    def sub_matrix(self, nodes):
+        # Square slice of the matrix restricted to `nodes`, in that order
+        rows = self.rows(nodes)
+        return self.matrix[np.ix_(rows, rows)]
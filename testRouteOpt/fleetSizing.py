@@ -0,0 +1,229 @@
+import contextlib
+import io
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+from alnsSolver import solve_alns
+from arcPruning import prune_arcs
+from routeHeuristics import RoutingData, savings_routes
+from solverPortfolio import kill
+
+# Seconds each candidate fleet size gets for its feasibility check
+FLEET_CHECK_TIME = 30.0
+
+# Seconds of that spent on ALNS before the MIP takes over; a heuristic
+# solution proves a fleet size feasible, only the MIP proves it infeasible
+FLEET_HEURISTIC_TIME = 2.0
+
+# Seconds past a check's time limit to wait for its report
+REPORT_GRACE = 5.0
+
+# Greedy clique searches started for the time-window bound
+CLIQUE_STARTS = 50
+
+logger = logging.getLogger('vrp.fleet')
+
+
+def capacity_bound(demand, capacity):
+    # Total goods over capacity, and customers with more than half a load
+    # can never share a vehicle with each other
+    demand = np.asarray(demand, dtype=float)
+    return max(math.ceil(demand.sum() / capacity - 1e-9), int((demand > capacity / 2).sum()))
+
+
+def incompatible_pairs(data):
+    # n x n (positions 1..n of RoutingData) matrix, True where two customers
+    # cannot be on one route in either order: their goods overflow a vehicle or
+    # neither can be reached from the other inside its window
+    start, end, travel = data.start[1:], data.end[1:], data.travel[1:, 1:]
+    earliest = np.maximum(start, data.start[0] + data.travel[0, 1:])
+    reachable = earliest <= end
+    if not reachable.all():
+        unreachable = [data.nodes[p + 1] for p in np.flatnonzero(~reachable)]
+        raise ValueError(f"Customers {unreachable} cannot be reached inside their windows with any fleet")
+    follows = np.maximum(start[None, :], earliest[:, None] + travel) <= end[None, :]
+    demand = data.demand[1:]
+    fits = demand[:, None] + demand[None, :] <= data.capacity + 1e-9
+    incompatible = ~((follows | follows.T) & fits)
+    np.fill_diagonal(incompatible, False)
+    return incompatible
+
+
+def clique_bound(incompatible):
+    # Size of a large clique of pairwise incompatible customers, each needs its
+    # own vehicle. Greedy from the CLIQUE_STARTS customers with most conflicts.
+    degree = incompatible.sum(axis=1)
+    best = 1 if len(degree) else 0
+    for first in np.argsort(-degree, kind='stable')[:CLIQUE_STARTS]:
+        if degree[first] + 1 <= best:
+            break
+        size = 1
+        candidates = incompatible[first].copy()
+        while candidates.any():
+            # The candidate with the most conflicts overall
+            chosen = int(np.argmax(np.where(candidates, degree, -1)))
+            size += 1
+            candidates &= incompatible[chosen]
+        best = max(best, size)
+    return best
+
+
+def fleet_bounds(vrp):
+    # Cheap bounds on the smallest fleet that serves every customer: capacity
+    # and time-window lower bounds, and a savings solution as upper bound.
+    # vrp.arcs must not leave out arcs a feasible route could use (see exact_instance).
+    data = RoutingData(vrp)
+    by_capacity = capacity_bound(data.demand[1:], data.capacity)
+    by_windows = clique_bound(incompatible_pairs(data))
+    routes = savings_routes(data)
+    return {
+        'capacity': by_capacity,
+        'time_windows': by_windows,
+        'lower': max(by_capacity, by_windows, 1 if len(routes) else 0),
+        'upper': len(routes),
+        'routes': data.to_ids(routes),
+        'objective': sum(data.route_distance(route) for route in routes),
+    }
+
+
+def fleet_task(vrp, time_limit, seed):
+    # Everything a check needs to rebuild the instance with another fleet size.
+    # The checks use the two-index matrix model: its size does not grow with
+    # the fleet and scipy's HiGHS is always there. vrp.arcs is left behind, it
+    # may be a granular subset (see exact_instance).
+    data = {
+        'depot': vrp.depot,
+        'customer_locations': vrp.customer_locations,
+        'goods_for_cus': vrp.goods_for_cus,
+        'time_windows': vrp.get_time_windows(),
+        'vehicle_capacity': vrp.vehicle_capacity,
+    }
+    options = {'metric': vrp.metric, 'road_network': vrp.road_network, 'formulation': 'two_index',
+               'assembly': 'matrix', 'threads': vrp.threads}
+    return type(vrp), data, options, vrp.depot_window, time_limit, seed
+
+
+def exact_instance(solver_class, data, options, depot_window, vehicles):
+    # The instance with every arc a feasible route could use: the complete
+    # graph less what prune_arcs proves useless. Bounds and infeasibility
+    # proofs on a granular or otherwise heuristic arc set would not hold.
+    sub = solver_class.from_data(**data, num_vehicles=vehicles, **options)
+    sub.depot_window = depot_window
+    sub.arcs = prune_arcs(sub)[0]
+    return sub
+
+
+def check_fleet(vehicles, task, results):
+    # Can `vehicles` vehicles serve every customer? 'feasible' with routes,
+    # 'infeasible' when the MIP proves it, 'unknown' at the time limit. Runs in
+    # its own process group so a moot check can be killed.
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    solver_class, data, options, depot_window, time_limit, seed = task
+    start = time.perf_counter()
+    try:
+        sub = exact_instance(solver_class, data, options, depot_window, vehicles)
+        heuristic_time = min(FLEET_HEURISTIC_TIME, time_limit / 4)
+        routes, objective, unassigned = solve_alns(sub, heuristic_time, seed, until_complete=True)
+        if not unassigned:
+            result = {'status': 'feasible', 'method': 'alns', 'objective': objective,
+                      'routes': [[i for i, _ in route] for route in routes if route]}
+        else:
+            # Any solution will do, so stop at the first incumbent
+            with contextlib.redirect_stdout(io.StringIO()):
+                sub.build_model()
+                routes = sub.solve(time_limit=max(time_limit - heuristic_time, 1.0), mip_rel_gap=1.0)
+            if routes is not None:
+                result = {'status': 'feasible', 'method': 'mip', 'objective': sub.objective,
+                          'routes': [[i for i, _ in route] for route in routes if route]}
+            else:
+                result = {'status': 'infeasible' if sub.solve_status == 'infeasible' else 'unknown', 'method': 'mip'}
+    except Exception as error:
+        result = {'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+    result.update(vehicles=vehicles, time=time.perf_counter() - start)
+    results.put(result)
+
+
+def minimize_fleet(vrp, time_limit=FLEET_CHECK_TIME, workers=None, seed=None):
+    # Smallest number of vehicles that serves every customer of vrp (its own
+    # num_vehicles is ignored). Fleet sizes between the lower bounds and the
+    # savings upper bound are checked in parallel, smallest first. Feasibility
+    # is monotone in the fleet size, so a feasible k makes every check above k
+    # moot and an infeasible k every check below it; moot checks are killed,
+    # and the search stops as soon as the two meet. Returns
+    # {'vehicles', 'proven', 'lower', 'upper', 'bounds', 'routes', 'objective', 'checks', 'time'}
+    # where 'proven' says whether 'vehicles' is the proven minimum and 'routes'
+    # (customer IDs per vehicle) serve everyone with that many vehicles.
+    search_start = time.perf_counter()
+    task = fleet_task(vrp, time_limit, seed)
+    solver_class, data, options, depot_window = task[:4]
+    bounds = fleet_bounds(exact_instance(solver_class, data, options, depot_window, vrp.num_vehicles))
+    lower, best = bounds['lower'], bounds['upper']
+    routes, objective = bounds['routes'], bounds['objective']
+    workers = workers or os.cpu_count() or 1
+    pending = list(range(lower, best))
+    running, checks = {}, {}
+    results = multiprocessing.Queue()
+    try:
+        while lower < best:
+            while pending and len(running) < workers:
+                vehicles = pending.pop(0)
+                if lower <= vehicles < best:
+                    process = multiprocessing.Process(target=check_fleet, args=(vehicles, task, results), daemon=True)
+                    process.start()
+                    running[vehicles] = (process, time.perf_counter())
+            if not running:
+                break
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                # A check that died without reporting, or one far past its time limit
+                for vehicles, (process, started) in list(running.items()):
+                    overdue = time.perf_counter() - started > time_limit + REPORT_GRACE
+                    if overdue or (not process.is_alive() and process.exitcode not in (0, None)):
+                        kill(process)
+                        del running[vehicles]
+                        error = 'no report in time' if overdue else f"exit code {process.exitcode}"
+                        checks[vehicles] = {'status': 'error', 'error': error, 'time': time.perf_counter() - started}
+                continue
+
+            vehicles = result['vehicles']
+            checks[vehicles] = {key: value for key, value in result.items() if key not in ('routes', 'vehicles')}
+            process, _ = running.pop(vehicles, (None, None))
+            if process is not None:
+                process.join()
+            if result['status'] == 'feasible' and vehicles < best:
+                best, routes, objective = vehicles, result['routes'], result['objective']
+            elif result['status'] == 'infeasible':
+                lower = max(lower, vehicles + 1)
+            for other, (process, started) in list(running.items()):
+                if not lower <= other < best:
+                    kill(process)
+                    del running[other]
+                    checks[other] = {'status': 'moot', 'time': time.perf_counter() - started}
+    finally:
+        for process, _ in running.values():
+            kill(process)
+        results.close()
+
+    outcome = {
+        'vehicles': best,
+        'proven': lower >= best,
+        'lower': lower,
+        'upper': bounds['upper'],
+        'bounds': {'capacity': bounds['capacity'], 'time_windows': bounds['time_windows'], 'savings': bounds['upper']},
+        'routes': routes,
+        'objective': objective,
+        'checks': dict(sorted(checks.items())),
+        'time': time.perf_counter() - search_start,
+    }
+    logger.info("Fleet size %d (%s) in %.2fs; bounds %s; checks %s", best, 'proven' if outcome['proven'] else f"lower bound {lower}",
+                outcome['time'], outcome['bounds'],
+                ", ".join(f"{vehicles} {check['status']}" for vehicles, check in outcome['checks'].items()))
+    return outcome
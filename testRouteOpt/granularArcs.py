@@ -0,0 +1,39 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from distanceMatrix import DEPOT_ID
+
+# Default number of nearest neighbours kept per customer
+GRANULAR_NEIGHBOURS = 10
+
+
+def spatial_points(vrp, nodes):
+    # Coordinates a KD-tree can rank by straight-line distance. (lat, lon)
+    # inputs go on the unit sphere, where chord length orders like great-circle distance.
+    locations = [vrp.depot if i == DEPOT_ID else vrp.customer_locations[i] for i in nodes]
+    points = np.array(locations, dtype=float)
+    if vrp.road_network is None and vrp.metric == 'euclidean':
+        return points
+    lat, lon = np.radians(points[:, 0]), np.radians(points[:, 1])
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def granular_arcs(vrp, k=GRANULAR_NEIGHBOURS):
+    # Arcs between each customer and its k nearest customers (both directions)
+    # plus every depot arc, drawn from the current vrp.arcs
+    customers = list(vrp.customers)
+    if k >= len(customers) - 1:
+        return list(vrp.arcs)
+
+    points = spatial_points(vrp, customers)
+    _, neighbours = cKDTree(points).query(points, k=k + 1)
+
+    n = len(customers)
+    near = np.zeros((n, n), dtype=bool)
+    near[np.repeat(np.arange(n), k + 1), neighbours.ravel()] = True
+    near |= near.T
+    np.fill_diagonal(near, False)
+
+    position = {i: p for p, i in enumerate(customers)}
+    return [(i, j) for i, j in vrp.arcs
+            if i == DEPOT_ID or j == DEPOT_ID or near[position[i], position[j]]]
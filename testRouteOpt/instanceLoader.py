@@ -0,0 +1,158 @@
+import csv
+import json
+import random
+
+# Bytes read from a JSON file at a time
+READ_CHUNK = 1 << 16
+
+DEFAULT_DEPOT = (4, 4)
+DEFAULT_CAPACITY = 10
+MINUTES_PER_DAY = 24 * 60
+
+
+class InstanceError(ValueError):
+    pass
+
+
+def read_records(path):
+    # Stream JSON objects from a file. Handles one object per line
+    # (customersAPI.log) as well as the pretty-printed objects written back to
+    # back in input_data.json, without loading the whole file.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    with open(path) as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            buffer += chunk
+            while True:
+                buffer = buffer.lstrip()
+                if not buffer:
+                    break
+                try:
+                    record, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise InstanceError(f"{path}: unreadable JSON near {buffer[:40]!r}")
+                    break
+                yield record
+                buffer = buffer[end:]
+            if not chunk:
+                return
+
+
+def parse_time(value):
+    # Minutes from midnight from {'hour', 'minute'}, "HH:MM" or a number of minutes
+    if isinstance(value, dict):
+        hour, minute = int(value['hour']), int(value['minute'])
+    elif isinstance(value, str) and ':' in value:
+        hour, minute = (int(part) for part in value.split(':', 1))
+    else:
+        return float(value)
+    if not (0 <= hour <= 24 and 0 <= minute < 60):
+        raise InstanceError(f"Invalid time {value!r}")
+    return hour * 60 + minute
+
+
+def time_for_sent(time_windows):
+    # Minute windows back to the input_data.json 'time_for_sent' layout
+    return {
+        i: {'start': {'hour': int(start) // 60, 'minute': int(start) % 60},
+            'end': {'hour': int(end) // 60, 'minute': int(end) % 60}}
+        for i, (start, end) in time_windows.items()
+    }
+
+
+def validate(instance):
+    customers = sorted(instance['customer_locations'])
+    if customers != list(range(1, len(customers) + 1)):
+        raise InstanceError("Customer IDs must be 1..n without gaps")
+    for name in ('goods_for_cus', 'time_windows'):
+        missing = set(customers) - set(instance[name])
+        if missing:
+            raise InstanceError(f"No {name} for customers {sorted(missing)}")
+    if instance['num_vehicles'] < 1:
+        raise InstanceError("num_vehicles must be at least 1")
+    for i in customers:
+        start, end = instance['time_windows'][i]
+        if not 0 <= start <= end <= MINUTES_PER_DAY:
+            raise InstanceError(f"Customer {i}: window ({start}, {end}) is not inside the day or ends before it starts")
+        goods = instance['goods_for_cus'][i]
+        if not 0 <= goods <= instance['vehicle_capacity']:
+            raise InstanceError(f"Customer {i}: goods {goods} do not fit a vehicle of capacity {instance['vehicle_capacity']}")
+    return instance
+
+
+def instance_from_record(record, seed=None):
+    # from_data() keyword arguments for one JSON record. Windows may come as
+    # 'time_for_sent' (input_data.json / customersAPI.log) or as 'time_windows'
+    # in minutes. Records without locations or goods (the request logs only
+    # carry counts) get them drawn like the interactive solver does, from `seed`.
+    try:
+        if 'time_for_sent' in record:
+            windows = {int(i): (parse_time(w['start']), parse_time(w['end'])) for i, w in record['time_for_sent'].items()}
+        else:
+            windows = {int(i): (parse_time(w[0]), parse_time(w[1])) for i, w in record['time_windows'].items()}
+        num_customers = int(record.get('num_customers', len(windows)))
+        num_vehicles = int(record['num_vehicles'])
+    except (KeyError, TypeError, ValueError) as error:
+        raise InstanceError(f"Malformed instance record: {error!r}") from error
+
+    rng = random.Random(seed)
+    if 'customer_locations' in record:
+        locations = {int(i): tuple(float(c) for c in p) for i, p in record['customer_locations'].items()}
+    else:
+        locations = {i: (rng.uniform(0, num_customers), rng.uniform(0, num_vehicles)) for i in range(1, num_customers + 1)}
+    if 'goods_for_cus' in record:
+        goods = {int(i): q for i, q in record['goods_for_cus'].items()}
+    else:
+        num_goods = int(record.get('num_goods', 1))
+        values = list(range(num_goods))
+        rng.shuffle(values)
+        goods = {i: values[j % num_goods] for j, i in enumerate(range(1, num_customers + 1))}
+
+    return validate({
+        'depot': tuple(record.get('depot', DEFAULT_DEPOT)),
+        'customer_locations': locations,
+        'goods_for_cus': goods,
+        'time_windows': windows,
+        'num_vehicles': num_vehicles,
+        'vehicle_capacity': record.get('vehicle_capacity', DEFAULT_CAPACITY),
+    })
+
+
+def instance_from_csv(path, num_vehicles, vehicle_capacity=DEFAULT_CAPACITY):
+    # One customer per row: id, x (or lat), y (or lon), goods, start, end with
+    # times as HH:MM or minutes. The row with id 0 is the depot.
+    depot, locations, goods, windows = DEFAULT_DEPOT, {}, {}, {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                i = int(row['id'])
+                point = (float(row.get('x') or row['lat']), float(row.get('y') or row['lon']))
+                if i == 0:
+                    depot = point
+                    continue
+                locations[i] = point
+                goods[i] = float(row['goods'])
+                windows[i] = (parse_time(row['start']), parse_time(row['end']))
+            except (KeyError, TypeError, ValueError) as error:
+                raise InstanceError(f"{path}: bad row {row}: {error!r}") from error
+    return validate({
+        'depot': depot,
+        'customer_locations': locations,
+        'goods_for_cus': goods,
+        'time_windows': windows,
+        'num_vehicles': int(num_vehicles),
+        'vehicle_capacity': vehicle_capacity,
+    })
+
+
+def load_instances(path, seed=None, num_vehicles=None, vehicle_capacity=DEFAULT_CAPACITY):
+    # Every instance in a .csv (one) or JSON/JSONL file (one per record)
+    if path.endswith('.csv'):
+        if num_vehicles is None:
+            raise InstanceError("A CSV instance needs num_vehicles")
+        yield instance_from_csv(path, num_vehicles, vehicle_capacity)
+        return
+    for n, record in enumerate(read_records(path)):
+        yield instance_from_record(record, None if seed is None else seed + n)
@@ -0,0 +1,99 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTORS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor,
+}
+
+# Finished jobs kept for GET /jobs/<id> before the oldest are forgotten
+JOB_HISTORY = 1000
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    # Runs solve jobs on a local pool and tracks them by id. submit() returns
+    # at once; a job is 'queued', 'running', 'done', 'failed' or 'cancelled'.
+    # At most `max_pending` jobs may be queued or running, beyond that submit()
+    # raises QueueFull so the caller can push back. A cancelled job that is
+    # still running keeps its worker busy, so it counts until its solve returns.
+    def __init__(self, worker, workers=None, executor='process', max_pending=100):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}', use one of {sorted(EXECUTORS)}")
+        self.worker = worker
+        self.max_pending = max_pending
+        self.executor = EXECUTORS[executor](max_workers=workers)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def pending(self):
+        return sum(not job['future'].done() for job in self.jobs.values())
+
+    def submit(self, *args):
+        with self.lock:
+            if self.pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs are already waiting")
+            job_id = uuid.uuid4().hex
+            job = {'id': job_id, 'status': 'queued', 'submitted': time.time(), 'result': None, 'error': None}
+            self.jobs[job_id] = job
+            job['future'] = self.executor.submit(self.worker, job_id, *args)
+        job['future'].add_done_callback(lambda future: self.finish(job_id, future))
+        self.forget_finished()
+        return job_id
+
+    def finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job['finished'] = time.time()
+            if job['status'] == 'cancelled':
+                # Cancelled while running: the result is discarded
+                return
+            if future.cancelled():
+                job['status'] = 'cancelled'
+            elif future.exception() is not None:
+                job['status'], job['error'] = 'failed', repr(future.exception())
+            else:
+                job['status'], job['result'] = 'done', future.result()
+
+    def status(self, job_id):
+        # Public view of a job, or None if unknown
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] == 'queued' and job['future'].running():
+                job['status'] = 'running'
+            view = {key: value for key, value in job.items() if key != 'future'}
+            view['queue_depth'] = self.pending()
+            return view
+
+    def cancel(self, job_id):
+        # Queued jobs never start. A running job cannot be interrupted, it
+        # stops at its time limit and finish() discards the result.
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job['status'] not in ('queued', 'running'):
+                return job['status']
+            job['status'] = 'cancelled'
+        # Outside the lock: a successful cancel() runs finish() right here
+        job['future'].cancel()
+        return 'cancelled'
+
+    def forget_finished(self):
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job['future'].done()]
+            for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                del self.jobs[job_id]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
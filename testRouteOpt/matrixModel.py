@@ -0,0 +1,223 @@
+import numpy as np
+import pyomo.environ as pyomo
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+from distanceMatrix import DEPOT_ID
+
+
+class VRPMatrixModel:
+    # The VRP of a VehicleRoutingProblemSolver emitted directly as sparse arrays:
+    #   minimize c @ v  subject to  row_lower <= A @ v <= row_upper,  lower <= v <= upper
+    # with integrality[n] = 1 for binary columns. Rows and columns follow the same
+    # constraint families as the Pyomo builders, built with NumPy instead of
+    # expression trees. to_pyomo() rebuilds an equivalent ConcreteModel for debugging.
+    # `formulation` overrides vrp.formulation (the cut loop always uses two_index).
+    def __init__(self, vrp, formulation=None):
+        self.formulation = formulation or vrp.formulation
+        self.arcs = list(vrp.arcs)
+        self.customers = list(vrp.customers)
+        self.num_vehicles = vrp.num_vehicles
+        # The two-index model has one copy of every arc for the whole fleet
+        self.copies = 1 if self.formulation == 'two_index' else vrp.num_vehicles
+
+        time_windows = vrp.get_model_windows()
+        capacity = vrp.vehicle_capacity
+        K = self.copies
+
+        customer_pos = {i: c for c, i in enumerate(self.customers)}
+        node_pos = {i: n for n, i in enumerate(vrp.nodes)}
+        tails = np.array([i for i, _ in self.arcs])
+        heads = np.array([j for _, j in self.arcs])
+        tail_c = np.array([customer_pos.get(i, -1) for i in tails])
+        head_c = np.array([customer_pos.get(j, -1) for j in heads])
+        tail_n = np.array([node_pos[i] for i in tails])
+        head_n = np.array([node_pos[j] for j in heads])
+
+        demand = np.array([vrp.goods_for_cus[i] for i in self.customers], dtype=float)
+        window_start = np.array([time_windows[i][0] for i in self.customers], dtype=float)
+        window_end = np.array([time_windows[i][1] for i in self.customers], dtype=float)
+        distance = vrp.distances.matrix[vrp.distances.rows(tails), vrp.distances.rows(heads)]
+        travel = vrp.travel_times.matrix[vrp.travel_times.rows(tails), vrp.travel_times.rows(heads)]
+
+        num_arcs, num_customers = len(self.arcs), len(self.customers)
+        ks = np.arange(K)
+
+        # Column blocks: x per (arc, copy), then goods and arrival_time per (customer, copy)
+        self.x_offset = 0
+        self.goods_offset = num_arcs * K
+        self.arrival_offset = self.goods_offset + num_customers * K
+        num_columns = self.arrival_offset + num_customers * K
+
+        def x_cols(arc_ids):
+            return (arc_ids[:, None] * K + ks).ravel()
+
+        def customer_cols(offset, customer_ids):
+            return (offset + customer_ids[:, None] * K + ks).ravel()
+
+        self.c = np.zeros(num_columns)
+        self.c[:self.goods_offset] = np.repeat(distance, K)
+        self.integrality = np.zeros(num_columns, dtype=np.uint8)
+        self.integrality[:self.goods_offset] = 1
+
+        self.lower = np.zeros(num_columns)
+        self.upper = np.ones(num_columns)
+        goods_lower = demand if self.formulation == 'two_index' else np.zeros(num_customers)
+        self.lower[self.goods_offset:self.arrival_offset] = np.repeat(goods_lower, K)
+        self.upper[self.goods_offset:self.arrival_offset] = capacity
+        self.lower[self.arrival_offset:] = np.repeat(window_start, K)
+        self.upper[self.arrival_offset:] = np.repeat(window_end, K)
+
+        rows, cols, vals = [], [], []
+        row_lower, row_upper = [], []
+        self.families = {}
+
+        def add_family(name, count, lower, upper):
+            start = sum(len(bound) for bound in row_lower)
+            row_lower.append(np.broadcast_to(np.asarray(lower, dtype=float), (count,)).copy())
+            row_upper.append(np.broadcast_to(np.asarray(upper, dtype=float), (count,)).copy())
+            self.families[name] = (start, count)
+            return start
+
+        def add_entries(r, c, v):
+            rows.append(np.asarray(r, dtype=np.int64))
+            cols.append(np.asarray(c, dtype=np.int64))
+            vals.append(np.broadcast_to(np.asarray(v, dtype=float), (len(r),)))
+
+        all_arcs = np.arange(num_arcs)
+        from_customer = all_arcs[tail_c >= 0]
+        from_depot = all_arcs[tails == DEPOT_ID]
+        to_customer = all_arcs[head_c >= 0]
+
+        if self.formulation == 'two_index':
+            start = add_family('out_degree_constraint', num_customers, 1, 1)
+            add_entries(start + tail_c[from_customer], from_customer, 1)
+
+            start = add_family('in_degree_constraint', num_customers, 1, 1)
+            add_entries(start + head_c[to_customer], to_customer, 1)
+
+            start = add_family('fleet_constraint', 1, -np.inf, self.num_vehicles)
+            add_entries(np.full(len(from_depot), start), from_depot, 1)
+
+            start = add_family('depot_constraint', 1, 0, 0)
+            to_depot = all_arcs[heads == DEPOT_ID]
+            add_entries(np.full(len(from_depot), start), from_depot, 1)
+            add_entries(np.full(len(to_depot), start), to_depot, -1)
+        else:
+            start = add_family('visits_constraint', num_customers, 1, 1)
+            add_entries(np.repeat(start + tail_c[from_customer], K), x_cols(from_customer), 1)
+
+            start = add_family('flow_constraint', len(node_pos) * K, 0, 0)
+            add_entries((start + tail_n[:, None] * K + ks).ravel(), x_cols(all_arcs), 1)
+            add_entries((start + head_n[:, None] * K + ks).ravel(), x_cols(all_arcs), -1)
+
+            start = add_family('depot_constraint', K, -np.inf, 1)
+            add_entries(np.tile(start + ks, len(from_depot)), x_cols(from_depot), 1)
+
+            start = add_family('capacity_constraint', K, -np.inf, capacity)
+            add_entries(np.tile(start + ks, len(from_customer)), x_cols(from_customer), np.repeat(demand[tail_c[from_customer]], K))
+
+        # Load and arrival-time flow over arcs into a customer; the two-index
+        # model bounds goods from below instead of linking it to depot arcs
+        if self.formulation == 'two_index':
+            load_arcs = to_customer[tail_c[to_customer] >= 0]
+        else:
+            load_arcs = to_customer
+        time_arcs = to_customer
+
+        for name, arcs, offset in (('load_constraint', load_arcs, self.goods_offset),
+                                   ('time_constraint', time_arcs, self.arrival_offset)):
+            depot_tail = tail_c[arcs] < 0
+            head_q = demand[head_c[arcs]]
+            if name == 'load_constraint':
+                coef = np.where(depot_tail, head_q, capacity)
+                lower = np.where(depot_tail, 0.0, head_q - capacity)
+            else:
+                big_m = np.maximum(0.0, window_end[tail_c[arcs]] + travel[arcs] - window_start[head_c[arcs]])
+                coef = np.where(depot_tail, travel[arcs], big_m)
+                lower = np.where(depot_tail, vrp.depot_window[0], travel[arcs] - big_m)
+
+            start = add_family(name, len(arcs) * K, np.repeat(lower, K), np.inf)
+            family_rows = start + np.arange(len(arcs) * K)
+            add_entries(family_rows, customer_cols(offset, head_c[arcs]), 1)
+            add_entries(family_rows, x_cols(arcs), -np.repeat(coef, K))
+            inner = np.repeat(~depot_tail, K)
+            add_entries(family_rows[inner], customer_cols(offset, tail_c[arcs][~depot_tail]), -1)
+
+        self.row_lower = np.concatenate(row_lower)
+        self.row_upper = np.concatenate(row_upper)
+        self.A = coo_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(self.row_lower), num_columns),
+        ).tocsr()
+
+    @property
+    def shape(self):
+        return self.A.shape
+
+    def solve(self, time_limit=None, mip_gap=None, disp=False):
+        # Hand the arrays straight to HiGHS through scipy.optimize.milp
+        options = {'disp': disp}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+        if mip_gap is not None:
+            options['mip_rel_gap'] = mip_gap
+        return milp(
+            self.c,
+            integrality=self.integrality,
+            bounds=Bounds(self.lower, self.upper),
+            constraints=LinearConstraint(self.A, self.row_lower, self.row_upper),
+            options=options,
+        )
+
+    def x_index(self):
+        if self.formulation == 'two_index':
+            return list(self.arcs)
+        return [(i, j, k) for i, j in self.arcs for k in range(self.copies)]
+
+    def customer_index(self):
+        if self.formulation == 'two_index':
+            return list(self.customers)
+        return [(i, k) for i in self.customers for k in range(self.copies)]
+
+    def active_arcs(self, solution):
+        # Arcs with x = 1, as (i, j) or (i, j, k) like the Pyomo models
+        x = np.asarray(solution)[self.x_offset:self.goods_offset]
+        index = self.x_index()
+        return [index[n] for n in np.flatnonzero(x > 0.5)]
+
+    def to_pyomo(self, solution=None):
+        # Rebuild an equivalent ConcreteModel (x, goods, arrival_time, one
+        # indexed constraint per family), optionally loaded with a solution
+        model = pyomo.ConcreteModel()
+        x_index, customer_index = self.x_index(), self.customer_index()
+        model.x = pyomo.Var(x_index, domain=pyomo.Binary)
+        model.goods = pyomo.Var(customer_index)
+        model.arrival_time = pyomo.Var(customer_index)
+
+        columns = ([model.x[idx] for idx in x_index]
+                   + [model.goods[idx] for idx in customer_index]
+                   + [model.arrival_time[idx] for idx in customer_index])
+        for n, var in enumerate(columns):
+            var.setlb(self.lower[n])
+            var.setub(self.upper[n])
+            if solution is not None:
+                var.set_value(solution[n], skip_validation=True)
+
+        model.obj = pyomo.Objective(
+            expr=sum(self.c[n] * columns[n] for n in np.flatnonzero(self.c)),
+            sense=pyomo.minimize
+        )
+
+        def row_rule(m, r):
+            begin, end = self.A.indptr[r], self.A.indptr[r + 1]
+            if begin == end:
+                return pyomo.Constraint.Skip
+            body = sum(coef * columns[col] for col, coef in zip(self.A.indices[begin:end], self.A.data[begin:end]))
+            lower = None if np.isinf(self.row_lower[r]) else self.row_lower[r]
+            upper = None if np.isinf(self.row_upper[r]) else self.row_upper[r]
+            return (lower, body, upper)
+
+        for name, (start, count) in self.families.items():
+            setattr(model, name, pyomo.Constraint(range(start, start + count), rule=row_rule))
+        return model
@@ -0,0 +1,272 @@
+import logging
+import time
+from collections import defaultdict
+
+import pyomo.environ as pyomo
+from pyomo.contrib.appsi.solvers import Gurobi, Highs
+
+from arcPruning import prune_arcs
+
+# Persistent (in-memory) solvers the session can drive
+PERSISTENT_SOLVERS = {
+    'highs': Highs,
+    'gurobi': Gurobi,
+}
+
+
+def persistent_available(solver):
+    # True when the in-process solver library (highspy, gurobipy) can be loaded
+    return solver in PERSISTENT_SOLVERS and bool(PERSISTENT_SOLVERS[solver]().available())
+
+
+def set_threads(persistent, solver, threads):
+    if solver == 'highs':
+        persistent.highs_options['threads'] = threads
+    else:
+        persistent.gurobi_options['Threads'] = threads
+
+
+class RoutingSession:
+    # Keeps one persistent solver attached to a built VehicleRoutingProblemSolver
+    # model. Edits change only the affected bounds/rows in the solver and the next
+    # solve() warm-starts from the previous incumbent. On a preprocessed instance
+    # an edit that relaxes it (a wider window, less goods, more capacity) prunes
+    # again, and arcs or windows that change rebuild the model.
+    def __init__(self, vrp, solver='highs'):
+        if solver not in PERSISTENT_SOLVERS:
+            raise ValueError(f"Unknown persistent solver '{solver}', use one of {sorted(PERSISTENT_SOLVERS)}")
+        if vrp.assembly != 'pyomo':
+            raise ValueError("A session needs the Pyomo model, build it with assembly='pyomo'")
+
+        self.vrp = vrp
+        self.solver_name = solver
+        self.removed_customers = set()
+        self.routes = None
+        self.objective = None
+        self.mip_gap = None
+        self.bound = None
+        self.solve_time = None
+
+        self.solver = PERSISTENT_SOLVERS[solver]()
+        if not self.solver.available():
+            raise RuntimeError(f"Persistent solver '{solver}' is not available")
+        self.solver.config.warmstart = True
+        self.solver.config.load_solution = False
+
+        # Every change is pushed explicitly, so skip the per-solve model scan
+        update_config = self.solver.update_config
+        update_config.check_for_new_or_removed_constraints = False
+        update_config.check_for_new_or_removed_vars = False
+        update_config.check_for_new_or_removed_params = False
+        update_config.check_for_new_objective = False
+        update_config.update_constraints = False
+        update_config.update_vars = False
+        update_config.update_params = False
+        update_config.update_named_expressions = False
+        update_config.update_objective = False
+
+        self.attach()
+
+    def attach(self):
+        # (Re)load the current model into the solver
+        if self.vrp.model.component('x') is None:
+            self.vrp.build_model()
+        self.solver.set_instance(self.vrp.model)
+        self.index_rows()
+
+    def index_rows(self):
+        # Row indices of the data-dependent families, by the customers they touch
+        self.rows_by_node = {name: defaultdict(list) for name in ('load_constraint', 'time_constraint')}
+        for name, rows in self.rows_by_node.items():
+            for idx in getattr(self.vrp.model, name):
+                rows[idx[0]].append(idx)
+                rows[idx[1]].append(idx)
+
+    def rule_for(self, name):
+        two_index = self.vrp.formulation == 'two_index'
+        return {
+            'load_constraint': self.vrp.two_index_load_rule if two_index else self.vrp.load_rule,
+            'time_constraint': self.vrp.two_index_arrival_time_rule if two_index else self.vrp.arrival_time_rule,
+            'capacity_constraint': self.vrp.capacity_rule,
+        }[name]
+
+    def refresh_rows(self, name, indices):
+        # Regenerate rows from the current data and swap them in the solver
+        component = getattr(self.vrp.model, name)
+        rule = self.rule_for(name)
+        rows = [component[idx] for idx in indices]
+        self.solver.remove_constraints(rows)
+        for idx, row in zip(indices, rows):
+            row.set_value(rule(self.vrp.model, *(idx if isinstance(idx, tuple) else (idx,))))
+        self.solver.add_constraints(rows)
+
+    def customer_vars(self, component, i):
+        var = getattr(self.vrp.model, component)
+        if self.vrp.formulation == 'two_index':
+            return [var[i]]
+        return [var[i, k] for k in self.vrp.vehicles]
+
+    def arc_vars(self, i):
+        x = self.vrp.model.x
+        arcs = [(a, b) for a, b in self.vrp.arcs if i in (a, b)]
+        if self.vrp.formulation == 'two_index':
+            return [x[a, b] for a, b in arcs]
+        return [x[a, b, k] for a, b in arcs for k in self.vrp.vehicles]
+
+    def prune(self):
+        # Prune a preprocessed instance again from the arcs preprocess() started
+        # with and the requested windows; True if the arcs or windows changed
+        vrp = self.vrp
+        if vrp.model_windows is None:
+            return False
+        arcs, windows = vrp.arcs, vrp.model_windows
+        vrp.arcs, vrp.model_windows = vrp.unpruned_arcs, None
+        vrp.arcs, vrp.model_windows, vrp.pruning_report = prune_arcs(vrp)
+        return vrp.arcs != arcs or vrp.model_windows != windows
+
+    def reprune(self):
+        # After an edit that relaxes the instance: arcs pruned for the old data
+        # may be usable now. Returns True if the model was rebuilt.
+        if not self.prune():
+            return False
+        self.rebuild()
+        return True
+
+    def set_time_window(self, i, start, end):
+        # New window for customer i, in minutes from midnight
+        old_start, old_end = self.vrp.time_windows[i]
+        self.vrp.time_windows[i] = (start, end)
+        if start < old_start or end > old_end:
+            if self.reprune():
+                return
+        if self.vrp.model_windows is not None:
+            # No earlier than the start pruning tightened the old window to
+            self.vrp.model_windows[i] = (max(start, self.vrp.model_windows[i][0]), end)
+        start, end = self.vrp.get_model_windows()[i]
+        variables = self.customer_vars('arrival_time', i)
+        for var in variables:
+            var.setlb(start)
+            var.setub(end)
+        self.solver.update_variables(variables)
+        # Big-M of every arc into or out of i depends on the window
+        self.refresh_rows('time_constraint', self.rows_by_node['time_constraint'][i])
+
+    def set_goods(self, i, goods):
+        relaxed = goods < self.vrp.goods_for_cus[i]
+        self.vrp.goods_for_cus[i] = goods
+        if relaxed and self.reprune():
+            return
+        if self.vrp.formulation == 'two_index':
+            variables = self.customer_vars('goods', i)
+            for var in variables:
+                var.setlb(goods)
+            self.solver.update_variables(variables)
+        else:
+            self.refresh_rows('capacity_constraint', list(self.vrp.vehicles))
+        self.refresh_rows('load_constraint', [idx for idx in self.rows_by_node['load_constraint'][i] if idx[1] == i])
+
+    def set_capacity(self, capacity):
+        relaxed = capacity > self.vrp.vehicle_capacity
+        self.vrp.vehicle_capacity = capacity
+        if relaxed and self.reprune():
+            return
+        variables = list(self.vrp.model.goods.values())
+        for var in variables:
+            var.setub(capacity)
+        self.solver.update_variables(variables)
+        if self.vrp.formulation != 'two_index':
+            self.refresh_rows('capacity_constraint', list(self.vrp.vehicles))
+        self.refresh_rows('load_constraint', list(self.vrp.model.load_constraint))
+
+    def visit_rows(self, i):
+        model = self.vrp.model
+        if self.vrp.formulation == 'two_index':
+            return [model.out_degree_constraint[i], model.in_degree_constraint[i]]
+        return [model.visits_constraint[i]]
+
+    def remove_customer(self, i):
+        # Drop customer i from the plan: its arcs are fixed to 0 and it no longer must be visited
+        if i in self.removed_customers:
+            return
+        variables = self.arc_vars(i)
+        for var in variables:
+            var.fix(0)
+        self.solver.update_variables(variables)
+        self.solver.remove_constraints(self.visit_rows(i))
+        self.removed_customers.add(i)
+
+    def add_customer(self, location=None, goods=None, window=None, i=None):
+        # Re-add a removed customer i, or append a new one at `location`
+        if i is not None and i in self.removed_customers:
+            variables = self.arc_vars(i)
+            for var in variables:
+                var.unfix()
+            self.solver.update_variables(variables)
+            self.solver.add_constraints(self.visit_rows(i))
+            self.removed_customers.discard(i)
+            if window is not None:
+                self.set_time_window(i, *window)
+            if goods is not None:
+                self.set_goods(i, goods)
+            return i
+
+        # A new node changes every index set, so rebuild the model and reuse the
+        # previous values as the MIP start for the variables that still exist
+        vrp = self.vrp
+        i = vrp.num_customers + 1
+        vrp.num_customers = i
+        vrp.customers = range(1, i + 1)
+        vrp.customer_names[i] = f"ID_{i}"
+        vrp.customer_locations[i] = location
+        vrp.goods_for_cus[i] = goods or 0
+        vrp.get_time_windows()[i] = window if window is not None else vrp.depot_window
+        vrp.refresh_distances()
+        # Every arc of the new node set, pruned again if the instance was
+        vrp.unpruned_arcs = list(vrp.arcs)
+        self.prune()
+        self.rebuild()
+        return i
+
+    def rebuild(self):
+        # A new index set (node or arcs) needs a new model; the previous values
+        # are its MIP start for the variables that still exist
+        vrp = self.vrp
+        previous = {(var.parent_component().name, var.index()): var.value
+                    for var in vrp.model.component_data_objects(pyomo.Var) if var.value is not None}
+        vrp.model = pyomo.ConcreteModel()
+        vrp.build_model()
+        for var in vrp.model.component_data_objects(pyomo.Var):
+            value = previous.get((var.parent_component().name, var.index()))
+            if value is not None:
+                var.set_value(value, skip_validation=True)
+            elif var.parent_component().name == 'x':
+                # New arcs start at 0 so the old incumbent stays a candidate
+                var.set_value(0)
+
+        self.attach()
+        removed, self.removed_customers = self.removed_customers, set()
+        for customer in removed:
+            self.remove_customer(customer)
+
+    def solve(self, time_limit=None, mip_rel_gap=None):
+        # Limits default to the solver's; stopped at a limit, the best incumbent
+        # is returned and mip_gap/bound tell how good it is
+        self.solver.config.time_limit = self.vrp.time_limit if time_limit is None else time_limit
+        self.solver.config.mip_gap = self.vrp.mip_rel_gap if mip_rel_gap is None else mip_rel_gap
+        if self.vrp.threads is not None:
+            set_threads(self.solver, self.solver_name, self.vrp.threads)
+        solve_start = time.perf_counter()
+        results = self.solver.solve(self.vrp.model)
+        self.solve_time = time.perf_counter() - solve_start
+
+        self.bound = results.best_objective_bound
+        if results.best_feasible_objective is None:
+            logging.error("Session re-solve found no feasible solution (%s)", results.termination_condition)
+            self.routes, self.objective, self.mip_gap = None, None, None
+            return None
+
+        results.solution_loader.load_vars()
+        self.objective = results.best_feasible_objective
+        self.mip_gap = abs(self.objective - self.bound) / max(abs(self.objective), 1e-10) if self.bound is not None else None
+        self.routes = self.vrp.extract_routes()
+        return self.routes
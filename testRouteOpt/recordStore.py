@@ -0,0 +1,271 @@
+import argparse
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from instanceLoader import read_records
+
+# Bump when the record layout changes
+RECORD_STORE_VERSION = 1
+
+# Bump when INDEX_SCHEMA changes; stored as the index's user_version
+INDEX_VERSION = 2
+
+RECORD_KINDS = ('instance', 'result')
+
+DATA_FILE = 'records.jsonl'
+INDEX_FILE = 'index.sqlite'
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    instance TEXT,
+    time REAL NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_instance ON records (instance, time);
+CREATE INDEX IF NOT EXISTS records_time ON records (time);
+CREATE INDEX IF NOT EXISTS records_kind ON records (kind, time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('indexed_end', 0);
+"""
+
+
+def record_hash(data):
+    # SHA-256 of the canonical JSON of a request, so repeats of the same
+    # request share an instance hash whatever their key order. The round trip
+    # turns integer keys into the strings a replayed record has.
+    data = json.loads(json.dumps(data, default=str))
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def timestamp(value):
+    # Seconds since the epoch from a number, a datetime/date or an ISO string
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.timestamp()
+
+
+class RecordStore:
+    # Append-only log of requests ('instance') and solutions ('result') with a
+    # SQLite side index. Records are compact JSON lines in records.jsonl:
+    #   {'id', 'kind', 'time', 'instance', 'data', 'version'}
+    # 'instance' is the record_hash of the request (for a result, of the
+    # request it solves). The index maps id -> byte offset, and is ordered by
+    # (instance, time), time and (kind, time), so get() is one seek and find()/scan()
+    # read only the records they return. The log is the source of truth: the
+    # index keeps the end of the run of lines it holds from the start of the
+    # log ('indexed_end'), and catches up from there (e.g. after a crash between
+    # the two writes) when the store is opened; reindex() rebuilds it from
+    # scratch. Opening costs a connection, so keep a store open (see open_store).
+    def __init__(self, directory='records'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.lock = threading.Lock()
+        self.index = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        # WAL lets other processes read the index while one appends, and
+        # commits without a full sync per record; the log is the durable copy
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute("PRAGMA synchronous=NORMAL")
+        if self.index.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            # Older indexes have no indexed_end, the first catch-up reindexes them
+            self.index.executescript(INDEX_SCHEMA)
+            self.index.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        open(self.data_path, 'ab').close()
+        self.catch_up()
+
+    def append(self, kind, data, instance=None, when=None):
+        # Appends one record and returns it; instance defaults to the hash of data
+        if kind not in RECORD_KINDS:
+            raise ValueError(f"Unknown record kind '{kind}', use one of {RECORD_KINDS}")
+        record = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'time': timestamp(when) if when is not None else time.time(),
+            'instance': instance or record_hash(data),
+            'data': data,
+            'version': RECORD_STORE_VERSION,
+        }
+        line = (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode()
+        with self.lock, open(self.data_path, 'ab') as f:
+            # The file lock keeps other processes' lines and offsets apart
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(line)
+                f.flush()
+                self.add_to_index(record, offset, len(line))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return record
+
+    def append_instance(self, data, when=None):
+        return self.append('instance', data, when=when)
+
+    def append_result(self, instance, data, when=None):
+        return self.append('result', data, instance, when)
+
+    def add_to_index(self, record, offset, length):
+        # A line right after the indexed run extends it. A line past a missing
+        # one (a process crashed between its two writes while another appended)
+        # leaves indexed_end at the gap, where the next catch-up starts.
+        with self.index:
+            self.index.execute(
+                "INSERT OR REPLACE INTO records (id, kind, instance, time, offset, length) VALUES (?, ?, ?, ?, ?, ?)",
+                (record['id'], record['kind'], record['instance'], record['time'], offset, length))
+            self.index.execute("UPDATE meta SET value = ? WHERE key = 'indexed_end' AND value = ?",
+                               (offset + length, offset))
+
+    def indexed_end(self):
+        return self.index.execute("SELECT value FROM meta WHERE key = 'indexed_end'").fetchone()[0]
+
+    def catch_up(self):
+        # Index whatever the log holds past the first line missing from the
+        # index; lines after it that are already indexed are indexed again
+        end = self.indexed_end()
+        with self.lock, open(self.data_path, 'rb') as f:
+            f.seek(end)
+            offset = end
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # A line still being written; the next open picks it up
+                    break
+                self.add_to_index(json.loads(line), offset, len(line))
+                offset += len(line)
+
+    def reindex(self):
+        with self.index:
+            self.index.execute("DELETE FROM records")
+            self.index.execute("UPDATE meta SET value = 0 WHERE key = 'indexed_end'")
+        self.catch_up()
+
+    def read_at(self, f, offset, length):
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+    def get(self, record_id):
+        # One record by id, or None
+        row = self.index.execute("SELECT offset, length FROM records WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None
+        with open(self.data_path, 'rb') as f:
+            return self.read_at(f, *row)
+
+    def read_rows(self, rows):
+        with open(self.data_path, 'rb') as f:
+            for offset, length in rows:
+                yield self.read_at(f, offset, length)
+
+    def find(self, instance, kind=None):
+        # Every record for an instance hash, oldest first
+        query = "SELECT offset, length FROM records WHERE instance = ?"
+        params = [instance]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        return self.read_rows(self.index.execute(query + " ORDER BY time", params).fetchall())
+
+    def latest(self, instance, kind='result'):
+        # Newest record of `kind` for an instance hash, or None
+        row = self.index.execute(
+            "SELECT offset, length FROM records WHERE instance = ? AND kind = ? ORDER BY time DESC LIMIT 1",
+            (instance, kind)).fetchone()
+        return next(self.read_rows([row]), None) if row is not None else None
+
+    def scan(self, start=None, end=None, kind=None):
+        # Records with start <= time < end (numbers, datetimes or ISO strings),
+        # oldest first, streamed from the log
+        query, params = "SELECT offset, length FROM records WHERE time >= ? AND time < ?", [
+            timestamp(start) if start is not None else float('-inf'),
+            timestamp(end) if end is not None else float('inf')]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        cursor = self.index.execute(query + " ORDER BY time", params)
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            yield from self.read_rows(rows)
+
+    def replay(self, kind=None):
+        # Every record in the order it was written, one line at a time
+        with open(self.data_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                record = json.loads(line)
+                if kind is None or record['kind'] == kind:
+                    yield record
+
+    def __len__(self):
+        return self.index.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self.index.close()
+
+
+# Stores open_store() keeps open, by (process id, directory)
+open_stores = {}
+open_stores_lock = threading.Lock()
+
+
+def open_store(directory='records'):
+    # One RecordStore per directory for the life of the process. A forked
+    # worker opens its own, SQLite connections must not cross a fork.
+    key = (os.getpid(), os.path.abspath(directory))
+    with open_stores_lock:
+        if key not in open_stores:
+            open_stores[key] = RecordStore(directory)
+        return open_stores[key]
+
+
+def record_solve(request, result=None, directory='records'):
+    # Appends a request and, if given, its result to the store in `directory`;
+    # returns the request's record
+    store = open_store(directory)
+    instance = store.append_instance(request)
+    if result is not None:
+        store.append_result(instance['instance'], result)
+    return instance
+
+
+def import_log(store, path):
+    # Appends every request in an old log (input_data.json, customersAPI.log)
+    # as an instance record; they carry no time, so they get the file's mtime
+    when = os.path.getmtime(path)
+    count = 0
+    for data in read_records(path):
+        store.append_instance(data, when=when)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import old request logs into a record store")
+    parser.add_argument('logs', nargs='+', help="input_data.json, customersAPI.log, ...")
+    parser.add_argument('-d', '--directory', default='records')
+    args = parser.parse_args()
+
+    store = RecordStore(args.directory)
+    for path in args.logs:
+        print(f"{path}: {import_log(store, path)} records")
+    print(f"{args.directory}: {len(store)} records")
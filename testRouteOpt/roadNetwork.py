@@ -0,0 +1,197 @@
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from distanceMatrix import DistanceMatrix, DEPOT_ID, EARTH_RADIUS_KM
+
+# Assumed free-flow speed (km/h) per OSM highway class
+HIGHWAY_SPEEDS = {
+    'motorway': 90, 'motorway_link': 60,
+    'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40,
+    'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 30,
+    'unclassified': 30, 'residential': 30,
+    'living_street': 10, 'service': 20,
+}
+DEFAULT_SPEED = 30
+
+CACHE_VERSION = 1
+
+# Farthest (km) a depot or customer may lie from its nearest road node
+MAX_SNAP_KM = 1.0
+
+# Unreachable pairs named in the error message
+REPORTED_PAIRS = 10
+
+
+def edge_lengths(lat1, lon1, lat2, lon2):
+    # Great-circle length (km) of many edges at once, inputs in degrees
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def read_osm(osm_path):
+    # Stream a local .osm XML extract and return node coordinates plus the
+    # directed road edges (as OSM node IDs) with their speed in km/h
+    coordinates = {}
+    edges = []
+
+    for _, element in ET.iterparse(osm_path, events=('end',)):
+        if element.tag == 'node':
+            coordinates[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            element.clear()
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            highway = tags.get('highway')
+            if highway is not None:
+                refs = [int(nd.get('ref')) for nd in element.iter('nd')]
+                speed = HIGHWAY_SPEEDS.get(highway, DEFAULT_SPEED)
+                oneway = tags.get('oneway', 'no')
+                for u, v in zip(refs, refs[1:]):
+                    if oneway == '-1':
+                        edges.append((v, u, speed))
+                    else:
+                        edges.append((u, v, speed))
+                        if oneway not in ('yes', 'true', '1') and highway != 'motorway':
+                            edges.append((v, u, speed))
+            element.clear()
+
+    return coordinates, edges
+
+
+def save_atomic(path, array):
+    # Write next to the target and rename, so readers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class RoadNetwork:
+    # Offline road distances/travel times from a local OSM extract. Matrices are
+    # computed with one batched Dijkstra run per metric and stored as .npy files
+    # that later solves over the same node set open memory-mapped.
+    def __init__(self, osm_path, cache_dir='road_cache', max_snap_km=MAX_SNAP_KM):
+        self.osm_path = osm_path
+        self.cache_dir = cache_dir
+        self.max_snap_km = max_snap_km
+        os.makedirs(cache_dir, exist_ok=True)
+
+        stat = os.stat(osm_path)
+        self.source_key = f"{os.path.abspath(osm_path)}|{stat.st_size}|{stat.st_mtime_ns}|v{CACHE_VERSION}"
+
+        self.graph_lat = None
+        self.graph_lon = None
+        self.distance_graph = None
+        self.time_graph = None
+        self.tree = None
+
+    def load_graph(self):
+        if self.distance_graph is not None:
+            return
+
+        graph_file = os.path.join(self.cache_dir, self.cache_key('graph') + '.npz')
+        if os.path.exists(graph_file):
+            data = np.load(graph_file)
+            lat, lon = data['lat'], data['lon']
+            heads, tails, lengths, minutes = data['heads'], data['tails'], data['lengths'], data['minutes']
+        else:
+            coordinates, edges = read_osm(self.osm_path)
+            used = sorted({node for u, v, _ in edges for node in (u, v) if node in coordinates})
+            position = {node: n for n, node in enumerate(used)}
+            lat = np.array([coordinates[node][0] for node in used])
+            lon = np.array([coordinates[node][1] for node in used])
+
+            edges = [(position[u], position[v], speed) for u, v, speed in edges if u in position and v in position]
+            heads = np.array([u for u, _, _ in edges], dtype=np.int64)
+            tails = np.array([v for _, v, _ in edges], dtype=np.int64)
+            speeds = np.array([speed for _, _, speed in edges], dtype=float)
+            lengths = edge_lengths(lat[heads], lon[heads], lat[tails], lon[tails])
+            minutes = lengths / speeds * 60
+            tmp_file = f"{graph_file}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_file, lat=lat, lon=lon, heads=heads, tails=tails, lengths=lengths, minutes=minutes)
+            os.replace(tmp_file, graph_file)
+
+        size = len(lat)
+        self.graph_lat, self.graph_lon = lat, lon
+        self.distance_graph = self.build_graph(heads, tails, lengths, size)
+        self.time_graph = self.build_graph(heads, tails, minutes, size)
+
+        # Scale longitude so nearest-node snapping is roughly isotropic
+        self.lon_scale = np.cos(np.radians(lat.mean())) if size else 1.0
+        self.tree = cKDTree(np.column_stack([lat, lon * self.lon_scale]))
+
+    @staticmethod
+    def build_graph(heads, tails, weights, size):
+        # Keep the cheapest of parallel edges; csr_matrix would sum them
+        order = np.lexsort((weights, tails, heads))
+        heads, tails, weights = heads[order], tails[order], weights[order]
+        first = np.ones(len(heads), dtype=bool)
+        first[1:] = (heads[1:] != heads[:-1]) | (tails[1:] != tails[:-1])
+        # Zero-length edges would be dropped as "no edge" by csgraph
+        weights = np.maximum(weights[first], 1e-9)
+        return csr_matrix((weights, (heads[first], tails[first])), shape=(size, size))
+
+    def cache_key(self, kind, points=None):
+        digest = hashlib.sha1(self.source_key.encode())
+        digest.update(kind.encode())
+        if points is not None:
+            digest.update(np.round(np.asarray(points, dtype=float), 6).tobytes())
+        return digest.hexdigest()
+
+    def snap(self, points):
+        # Nearest road-graph vertex for each (lat, lon)
+        points = np.asarray(points, dtype=float)
+        _, vertices = self.tree.query(np.column_stack([points[:, 0], points[:, 1] * self.lon_scale]))
+        return vertices
+
+    def compute(self, nodes, points):
+        # nodes are the depot/customer IDs of points, for the error messages
+        self.load_graph()
+        vertices = self.snap(points)
+        points = np.asarray(points, dtype=float)
+        snap_km = edge_lengths(points[:, 0], points[:, 1], self.graph_lat[vertices], self.graph_lon[vertices])
+        far = np.flatnonzero(snap_km > self.max_snap_km)
+        if len(far):
+            raise ValueError(f"Road network: {[nodes[n] for n in far]} lie more than {self.max_snap_km} km "
+                             f"from any road in {self.osm_path} (nearest: {np.round(snap_km[far], 2).tolist()} km)")
+        unique_vertices, inverse = np.unique(vertices, return_inverse=True)
+
+        # One many-to-many run per metric over the distinct snapped vertices
+        distance = dijkstra(self.distance_graph, directed=True, indices=unique_vertices)[:, unique_vertices]
+        minutes = dijkstra(self.time_graph, directed=True, indices=unique_vertices)[:, unique_vertices]
+
+        distance, minutes = distance[np.ix_(inverse, inverse)], minutes[np.ix_(inverse, inverse)]
+        # inf would reach the objective and the big-M terms as an opaque solver error
+        tails, heads = np.nonzero(np.isinf(distance))
+        if len(tails):
+            pairs = [(nodes[i], nodes[j]) for i, j in zip(tails[:REPORTED_PAIRS], heads[:REPORTED_PAIRS])]
+            raise ValueError(f"Road network: {len(tails)} (from, to) pairs have no route in {self.osm_path}, "
+                             f"e.g. {pairs} (0 is the depot)")
+        return distance, minutes
+
+    def matrices(self, depot, customer_locations):
+        # Returns (distance in km, travel time in minutes) as DistanceMatrix objects
+        nodes = [DEPOT_ID] + list(customer_locations)
+        points = [depot] + [customer_locations[i] for i in customer_locations]
+
+        key = self.cache_key('matrix', points)
+        distance_file = os.path.join(self.cache_dir, key + '.distance.npy')
+        time_file = os.path.join(self.cache_dir, key + '.time.npy')
+
+        if not (os.path.exists(distance_file) and os.path.exists(time_file)):
+            distance, minutes = self.compute(nodes, points)
+            save_atomic(distance_file, distance)
+            save_atomic(time_file, minutes)
+
+        distance = np.load(distance_file, mmap_mode='r')
+        minutes = np.load(time_file, mmap_mode='r')
+        return (DistanceMatrix.from_array(nodes, distance, metric='road_km'),
+                DistanceMatrix.from_array(nodes, minutes, metric='road_minutes'))
@@ -0,0 +1,105 @@
+import numpy as np
+
+from distanceMatrix import DEPOT_ID
+
+
+class Route(list):
+    # One vehicle's arcs (i, j) in driving order from the first customer back to
+    # the depot, the shape plot_routes and the printers expect, plus its
+    # schedule: arrival time (minutes) and goods collected up to each stop
+    def __init__(self, arcs=(), vehicle=None, arrivals=(), loads=(), distance=0.0):
+        super().__init__(arcs)
+        self.vehicle = vehicle
+        self.arrivals = list(arrivals)
+        self.loads = list(loads)
+        self.distance = distance
+
+    @property
+    def stops(self):
+        return [i for i, _ in self]
+
+    def schedule(self):
+        # [{'customer', 'arrival', 'load'}, ...] in visiting order
+        return [{'customer': i, 'arrival': arrival, 'load': load}
+                for i, arrival, load in zip(self.stops, self.arrivals, self.loads)]
+
+
+def active_arcs(vrp):
+    # Arcs with x = 1 in the loaded solution, (i, j) or (i, j, k) like the
+    # models. The Pyomo values come out in one extract_values() call and are
+    # filtered as an array; unset values read as NaN and count as 0.
+    if vrp.assembly == 'matrix':
+        return vrp.matrix_model.active_arcs(vrp.matrix_solution)
+    return active_indices(vrp.model.x)
+
+
+def active_indices(x):
+    # Indices of a binary Pyomo variable at 1, read in one extract_values() call
+    values = x.extract_values()
+    index = list(values)
+    x = np.array(list(values.values()), dtype=float)
+    return [index[n] for n in np.flatnonzero(x > 0.5)]
+
+
+def earliest_schedule(vrp, stops):
+    # Earliest arrival at each stop (waiting for windows to open) and the goods
+    # collected up to it, leaving the depot when it opens. The MIP's own
+    # arrival_time values may sit anywhere inside their windows.
+    time_windows = vrp.get_model_windows()
+    arrivals, loads = [], []
+    clock, load, previous = vrp.depot_window[0], 0, DEPOT_ID
+    for i in stops:
+        clock = max(time_windows[i][0], clock + vrp.travel_times[previous, i])
+        load += vrp.goods_for_cus[i]
+        arrivals.append(float(clock))
+        loads.append(load)
+        previous = i
+    return arrivals, loads
+
+
+def make_route(vrp, arcs, vehicle=None):
+    # Route for ordered arcs in the plot_routes shape (first customer .. depot)
+    stops = [i for i, _ in arcs]
+    if not stops:
+        return Route(vehicle=vehicle)
+    arrivals, loads = earliest_schedule(vrp, stops)
+    distance = vrp.distances[DEPOT_ID, stops[0]] + sum(vrp.distances[i, j] for i, j in arcs)
+    return Route(arcs, vehicle, arrivals, loads, float(distance))
+
+
+def follow(successor, first):
+    # Arcs from `first` along successor links until the depot
+    arcs = []
+    i = first
+    while i != DEPOT_ID:
+        if len(arcs) > len(successor):
+            raise ValueError(f"Route from customer {first} does not return to the depot")
+        arcs.append((i, successor[i]))
+        i = successor[i]
+    return arcs
+
+
+def ordered_arcs(active, formulation, num_vehicles):
+    # Arcs in driving order per vehicle (empty for unused ones), rebuilt from
+    # the active arcs by following successors out of the depot
+    if formulation == 'two_index':
+        # The fleet shares the arcs; each arc out of the depot starts one vehicle
+        successor = {i: j for i, j in active if i != DEPOT_ID}
+        firsts = [j for i, j in active if i == DEPOT_ID]
+        firsts += [None] * (num_vehicles - len(firsts))
+        successors = [successor] * num_vehicles
+    else:
+        successors = [{} for _ in range(num_vehicles)]
+        firsts = [None] * num_vehicles
+        for i, j, k in active:
+            if i == DEPOT_ID:
+                firsts[k] = j
+            else:
+                successors[k][i] = j
+    return [follow(successors[k], firsts[k]) if firsts[k] is not None else [] for k in range(num_vehicles)]
+
+
+def ordered_routes(vrp):
+    # One Route per vehicle with its schedule
+    arcs = ordered_arcs(active_arcs(vrp), vrp.formulation, vrp.num_vehicles)
+    return [make_route(vrp, arcs[k], k) for k in vrp.vehicles]
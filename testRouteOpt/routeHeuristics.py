@@ -0,0 +1,139 @@
+import numpy as np
+
+from distanceMatrix import DEPOT_ID
+
+# Solomon's time-oriented nearest neighbour weights: distance, time gap, urgency
+NN_WEIGHTS = (1 / 3, 1 / 3, 1 / 3)
+
+
+class RoutingData:
+    # Plain arrays for heuristics, indexed by position (0 = depot, 1..n = customers)
+    def __init__(self, vrp):
+        time_windows = vrp.get_model_windows()
+        self.nodes = [DEPOT_ID] + list(vrp.customers)
+        self.distance = vrp.distances.sub_matrix(self.nodes)
+        self.travel = vrp.travel_times.sub_matrix(self.nodes)
+        n = len(self.nodes)
+        if len(vrp.arcs) < n * (n - 1):
+            # Arcs left out of vrp.arcs (pruned or outside the granular neighbourhood)
+            # take forever to drive, so every schedule check rejects them
+            position = {i: p for p, i in enumerate(self.nodes)}
+            allowed = np.eye(n, dtype=bool)
+            tails, heads = zip(*vrp.arcs)
+            allowed[[position[i] for i in tails], [position[j] for j in heads]] = True
+            self.travel = np.where(allowed, self.travel, np.inf)
+        self.demand = np.array([0] + [vrp.goods_for_cus[i] for i in vrp.customers], dtype=float)
+        self.start = np.array([vrp.depot_window[0]] + [time_windows[i][0] for i in vrp.customers], dtype=float)
+        self.end = np.array([vrp.depot_window[1]] + [time_windows[i][1] for i in vrp.customers], dtype=float)
+        self.capacity = vrp.vehicle_capacity
+        self.num_vehicles = vrp.num_vehicles
+
+    def schedule(self, route):
+        # Arrival times along a route of positions (waiting allowed), or None if a window is missed
+        arrivals = []
+        clock = self.start[0]
+        previous = 0
+        for n in route:
+            clock = max(self.start[n], clock + self.travel[previous, n])
+            if clock > self.end[n]:
+                return None
+            arrivals.append(clock)
+            previous = n
+        return arrivals
+
+    def feasible(self, route):
+        return self.demand[route].sum() <= self.capacity and self.schedule(route) is not None
+
+    def route_distance(self, route):
+        if not route:
+            return 0.0
+        path = [0] + list(route) + [0]
+        return float(self.distance[path[:-1], path[1:]].sum())
+
+    def to_ids(self, routes):
+        return [[self.nodes[n] for n in route] for route in routes]
+
+
+def savings_routes(data):
+    # Clarke-Wright savings with capacity and time-window checks on every merge
+    n = len(data.nodes)
+    routes = {c: [c] for c in range(1, n)}
+    route_of = {c: c for c in range(1, n)}
+
+    to_depot = data.distance[0]
+    savings = to_depot[:, None] + to_depot[None, :] - data.distance
+    first, second = np.triu_indices(n, k=1)
+    keep = first > 0
+    first, second = first[keep], second[keep]
+    order = np.argsort(-savings[first, second], kind='stable')
+
+    for i, j in zip(first[order], second[order]):
+        if savings[i, j] <= 0:
+            break
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj:
+            continue
+        # Join end of one route to the start of the other, in either direction
+        for head, tail in ((ri, rj), (rj, ri)):
+            a, b = routes[head], routes[tail]
+            if a[-1] in (i, j) and b[0] in (i, j):
+                merged = a + b
+                if data.feasible(merged):
+                    routes[head] = merged
+                    del routes[tail]
+                    for c in b:
+                        route_of[c] = head
+                    break
+
+    return sorted(routes.values(), key=lambda route: data.start[route[0]])
+
+
+def nearest_neighbour_routes(data):
+    # Time-oriented nearest neighbour: extend the current route with the
+    # cheapest feasible customer, open a new vehicle when none fits
+    n = len(data.nodes)
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    w_distance, w_time, w_urgency = NN_WEIGHTS
+    routes = []
+
+    while unvisited.any() and len(routes) < data.num_vehicles:
+        route, load, clock, current = [], 0.0, data.start[0], 0
+        while True:
+            candidates = np.flatnonzero(unvisited)
+            arrival = np.maximum(data.start[candidates], clock + data.travel[current, candidates])
+            fits = (arrival <= data.end[candidates]) & (load + data.demand[candidates] <= data.capacity)
+            if not fits.any():
+                break
+            candidates, arrival = candidates[fits], arrival[fits]
+            cost = (w_distance * data.distance[current, candidates]
+                    + w_time * (arrival - clock)
+                    + w_urgency * (data.end[candidates] - arrival))
+            best = int(np.argmin(cost))
+            current, clock = int(candidates[best]), float(arrival[best])
+            load += data.demand[current]
+            unvisited[current] = False
+            route.append(current)
+        if not route:
+            break
+        routes.append(route)
+
+    # Customers left over get their own (possibly extra) route
+    routes.extend([c] for c in np.flatnonzero(unvisited))
+    return routes
+
+
+HEURISTICS = {
+    'savings': savings_routes,
+    'nearest_neighbour': nearest_neighbour_routes,
+}
+
+
+def initial_routes(vrp, method='savings'):
+    # Returns (routes as lists of customer IDs, total distance, fits the fleet)
+    if method not in HEURISTICS:
+        raise ValueError(f"Unknown construction heuristic '{method}', use one of {sorted(HEURISTICS)}")
+    data = RoutingData(vrp)
+    routes = HEURISTICS[method](data)
+    feasible = len(routes) <= data.num_vehicles and all(data.feasible(route) for route in routes)
+    return data.to_ids(routes), sum(data.route_distance(route) for route in routes), feasible
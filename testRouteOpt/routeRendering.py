@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+# One colour per vehicle, cycled; all valid matplotlib and CSS names
+ROUTE_COLORS = ['aquamarine', 'coral', 'lime', 'salmon', 'khaki', 'orchid',
+                'peru', 'slategray', 'tomato', 'wheat', 'steelblue', 'bisque', 'cadetblue',
+                'darkorchid', 'firebrick', 'goldenrod', 'limegreen', 'navajowhite',
+                'rosybrown', 'seagreen']
+
+# Above this many customers the per-customer ID labels are left out
+LABEL_LIMIT = 200
+
+# Backends that cannot open a window; plot_routes saves or closes instead of show()
+NON_INTERACTIVE_BACKENDS = ('agg', 'pdf', 'pgf', 'ps', 'svg', 'cairo', 'template')
+
+
+def route_paths(routes, depot, customer_locations):
+    # depot -> stops -> depot polyline per non-empty route, as (n, 2) arrays
+    paths, vehicles = [], []
+    for k, route in enumerate(routes):
+        if route:
+            stops = [customer_locations[i] for i, _ in route]
+            paths.append(np.array([depot] + stops + [depot], dtype=float))
+            vehicles.append(k)
+    return paths, vehicles
+
+
+def draw_routes(ax, routes, depot, customer_locations, labels=None):
+    # Everything on one Axes with three artists: one scatter for the customers,
+    # one LineCollection for all routes and the depot marker
+    customers = list(customer_locations)
+    points = np.array([customer_locations[i] for i in customers], dtype=float).reshape(-1, 2)
+    ax.scatter(points[:, 0], points[:, 1], color='blue', s=12, zorder=2)
+    ax.scatter(*depot, color='black', marker='D', s=100, label='Depot', zorder=3)
+    show_labels = labels if labels is not None else len(customers) <= LABEL_LIMIT
+    if show_labels:
+        for i, (x, y) in zip(customers, points):
+            ax.text(x, y, f"ID_{i}", fontsize=8, ha='right')
+
+    paths, vehicles = route_paths(routes, depot, customer_locations)
+    colors = [ROUTE_COLORS[k % len(ROUTE_COLORS)] for k in vehicles]
+    ax.add_collection(LineCollection(paths, colors=colors, linewidths=1.5, zorder=1))
+    if len(vehicles) <= len(ROUTE_COLORS):
+        for k, color in zip(vehicles, colors):
+            ax.plot([], [], color=color, label=f'Vehicle {k + 1} route')
+    ax.autoscale_view()
+    ax.set_title('Vehicle Routes')
+    ax.set_xlabel('X-coordinate')
+    ax.set_ylabel('Y-coordinate')
+    ax.legend(loc='upper right')
+
+
+def render_png(routes, depot, customer_locations, path, labels=None, dpi=100):
+    # Off-screen Agg figure written to `path`; no pyplot, so no global state
+    # and nothing that needs a display
+    figure = Figure(figsize=(10, 10))
+    FigureCanvasAgg(figure)
+    draw_routes(figure.add_subplot(), routes, depot, customer_locations, labels)
+    figure.savefig(path, dpi=dpi)
+    return path
+
+
+def route_geojson(routes, depot, customer_locations):
+    # One FeatureCollection with a LineString per route. Locations are
+    # (lat, lon) like the Folium map; GeoJSON wants [lon, lat].
+    paths, vehicles = route_paths(routes, depot, customer_locations)
+    return {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'properties': {'vehicle': k + 1, 'color': ROUTE_COLORS[k % len(ROUTE_COLORS)]},
+            'geometry': {'type': 'LineString', 'coordinates': path[:, ::-1].tolist()},
+        } for k, path in zip(vehicles, paths)],
+    }
+
+
+def render_map(routes, depot, customer_locations, path):
+    # Folium map with two layers whatever the size: every route in one GeoJSON
+    # layer and every customer in one FastMarkerCluster
+    route_map = folium.Map(location=depot, zoom_start=14)
+    folium.Marker(depot, popup='Depot', icon=folium.Icon(color='black', icon='home')).add_to(route_map)
+    FastMarkerCluster([list(customer_locations[i]) for i in customer_locations], name='Customers').add_to(route_map)
+    folium.GeoJson(
+        route_geojson(routes, depot, customer_locations),
+        name='Routes',
+        style_function=lambda feature: {'color': feature['properties']['color'], 'weight': 2.5, 'opacity': 1},
+        tooltip=folium.GeoJsonTooltip(fields=['vehicle']),
+    ).add_to(route_map)
+    route_map.save(path)
+    return path
+
+
+RENDERERS = {
+    'png': render_png,
+    'html': render_map,
+}
+
+
+def render_job(job):
+    fmt, routes, depot, customer_locations, path = job
+    return RENDERERS[fmt](routes, depot, customer_locations, path)
+
+
+def render_many(solutions, output_dir, fmt='png', workers=None):
+    # Render (name, routes, depot, customer_locations) solutions to
+    # <output_dir>/<name>.<fmt> on a process pool; returns the paths in order
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown render format '{fmt}', use one of {sorted(RENDERERS)}")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(fmt, [list(route) for route in routes], depot, customer_locations, os.path.join(output_dir, f"{name}.{fmt}"))
+            for name, routes, depot, customer_locations in solutions]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_job, jobs))
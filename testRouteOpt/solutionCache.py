@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Bump when the cached entry layout or the key payload changes
+SOLUTION_CACHE_VERSION = 1
+
+# Defaults for the two tiers
+MEMORY_ENTRIES = 256
+DISK_BYTES = 64 * 1024 * 1024
+
+
+def instance_key(depot, customer_locations, time_windows, goods_for_cus, num_vehicles, vehicle_capacity, settings=None):
+    # SHA-256 of a canonical JSON payload: customers sorted by ID, coordinates
+    # rounded to 1e-9, windows in minutes, plus whatever solver settings change the answer
+    customers = sorted(customer_locations)
+    payload = {
+        'version': SOLUTION_CACHE_VERSION,
+        'depot': [round(float(c), 9) for c in depot],
+        'customers': [
+            [i, [round(float(c), 9) for c in customer_locations[i]],
+             [float(t) for t in time_windows[i]], float(goods_for_cus[i])]
+            for i in customers
+        ],
+        'num_vehicles': int(num_vehicles),
+        'vehicle_capacity': float(vehicle_capacity),
+        'settings': settings or {},
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SolutionCache:
+    # Solved instances by instance_key: an in-memory LRU in front of one JSON
+    # file per entry on disk. The disk tier drops the least recently used
+    # files once it grows past max_bytes.
+    def __init__(self, directory='solution_cache', memory_entries=MEMORY_ENTRIES, max_bytes=DISK_BYTES):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        # {'routes': [[(i, j), ...], ...], 'objective': float} or None
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self.read(key) if self.directory is not None else None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.remember(key, entry)
+        return entry
+
+    def put(self, key, routes, objective):
+        entry = {'routes': [[tuple(arc) for arc in route] for route in routes], 'objective': float(objective)}
+        with self.lock:
+            self.remember(key, entry)
+        if self.directory is not None:
+            self.write(key, entry)
+            self.evict()
+        return entry
+
+    def remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def read(self, key):
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Reads count as use for the disk LRU
+        os.utime(path)
+        return {'routes': [[tuple(arc) for arc in route] for route in stored['routes']], 'objective': stored['objective']}
+
+    def write(self, key, entry):
+        # Write next to the target and rename, so readers never see a partial file
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
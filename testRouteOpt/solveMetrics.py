@@ -0,0 +1,152 @@
+import io
+import json
+import logging
+import platform
+import re
+import resource
+import time
+import traceback
+import tracemalloc
+from contextlib import contextmanager
+
+# Phases a solve goes through, in order; a run records the ones it reaches
+PHASES = ('generate', 'distances', 'variables', 'objective', 'constraints', 'assembly',
+          'write', 'solve', 'load', 'extract', 'plot')
+
+# report_timing lines of Pyomo's shell solvers
+PYOMO_TIMING = re.compile(r"([\d.]+) seconds required (to write file|for solver|for postsolve)")
+PYOMO_PHASES = {'to write file': 'write', 'for solver': 'solve', 'for postsolve': 'load'}
+
+# New incumbents in a CBC log: objective and seconds since the start
+CBC_INCUMBENT = re.compile(r"Cbc00(?:04|12)I Integer solution of (\S+) found.*?\(([\d.]+) seconds\)")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024)
+
+
+class SolveMetrics:
+    # Wall time and memory per phase plus solver statistics for one solver
+    # instance. With trace_memory, memory is the tracemalloc peak inside each
+    # phase (slower, but exact); otherwise it is how far the process RSS
+    # high-water mark moved, which stays 0 for phases that reuse memory.
+    def __init__(self, sink=None, trace_memory=False):
+        self.sink = sink
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.phases = {}
+        self.counts = {}
+        self.solver = {}
+        self.status = None
+        self.objective = None
+        self.error = None
+        self.started = time.time()
+
+    @contextmanager
+    def phase(self, name):
+        # Repeated phases add up; 'calls' says how often one ran
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        else:
+            before = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self.trace_memory:
+                memory = (tracemalloc.get_traced_memory()[1] - before) / (1024 * 1024)
+            else:
+                memory = peak_rss_mb() - before
+            self.record(name, seconds, memory)
+
+    def record(self, name, seconds, memory_mb=None):
+        entry = self.phases.setdefault(name, {'time': 0.0, 'memory_mb': None, 'calls': 0})
+        entry['time'] += seconds
+        entry['calls'] += 1
+        if memory_mb is not None:
+            entry['memory_mb'] = max(entry['memory_mb'] or 0.0, memory_mb)
+
+    def record_pyomo_timing(self, output):
+        # Write, solver and postsolve times from a report_timing=True solve
+        for seconds, step in PYOMO_TIMING.findall(output):
+            self.record(PYOMO_PHASES[step], float(seconds))
+
+    def record_cbc_log(self, log):
+        self.solver['incumbents'] = [(float(seconds), float(objective)) for objective, seconds in CBC_INCUMBENT.findall(log)]
+
+    def overhead(self):
+        # Seconds spent around the solver rather than in it: handing the model
+        # over, reading the solution back and, where the solver reports its own
+        # run time, process start-up and shutdown
+        total = sum(self.phases[name]['time'] for name in ('write', 'load') if name in self.phases)
+        solver_time = self.solver.get('solver_time')
+        if solver_time is not None and 'solve' in self.phases:
+            total += max(0.0, self.phases['solve']['time'] - solver_time)
+        return total
+
+    def fail(self, error):
+        self.status = 'error'
+        self.error = {
+            'type': type(error).__name__,
+            'message': str(error),
+            'traceback': ''.join(traceback.format_exception(type(error), error, error.__traceback__)),
+        }
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'status': self.status,
+            'objective': self.objective,
+            'phases': {name: dict(entry) for name, entry in self.phases.items()},
+            'counts': dict(self.counts),
+            'solver': dict(self.solver),
+            'overhead': self.overhead(),
+            'memory': 'tracemalloc' if self.trace_memory else 'rss',
+            'error': self.error,
+        }
+
+    def emit(self):
+        # Hand the current record to the sink, if there is one
+        if self.sink is not None:
+            self.sink(self.to_dict())
+
+    def summary(self):
+        parts = [f"{name} {self.phases[name]['time']:.3f}s" for name in PHASES if name in self.phases]
+        return "Phases: " + ", ".join(parts)
+
+
+class JsonLinesSink:
+    # Appends one JSON line per record, e.g. for a log shipper to pick up
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+
+class LoggingSink:
+    # Sends each record as JSON through a logger
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('vrp.metrics')
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level, json.dumps(record, default=str))
+
+
+class CapturedOutput(io.StringIO):
+    # Keeps everything written to it and, with an echo stream, passes it on
+    def __init__(self, echo=None):
+        super().__init__()
+        self.echo = echo
+
+    def write(self, text):
+        if self.echo is not None:
+            self.echo.write(text)
+        return super().write(text)
@@ -1,117 +1,191 @@
-import pyomo
+import pyomo.environ as pyomo
 from pyomo.opt import SolverFactory
 import random 
-from testFuncTime import plot_routes, get_user_input_time,  write_input_data_to_json, distance
+import time
+from testFuncTime import plot_routes, get_user_input_time
+from recordStore import record_solve
+from distanceMatrix import DistanceMatrix, DEPOT_ID
+from solutionCache import instance_key
+from fleetSizing import minimize_fleet
+from solveRouteClass import VehicleRoutingProblemSolver
+from routeExtraction import active_indices, ordered_arcs
 import logging
-def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods):
+def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods, cache=None, time_windows=None, vehicle_capacity=10,
+                                  minimize_vehicles=False, instance=None, time_limit=None, raise_errors=False):
+    # Returns (routes, objective), or (None, None) without an optimal solution.
+    # time_windows in minutes skips the console prompts (benchmarks, batch runs).
+    # `instance` is an instanceLoader dict (depot, customer_locations, goods_for_cus,
+    # time_windows, num_vehicles, vehicle_capacity) solved as given; without one,
+    # locations and goods are drawn from `random`. With minimize_vehicles the
+    # model gets the fewest vehicles that serve every customer (see fleetSizing)
+    # instead of num_vehicles. time_limit stops CBC after that many seconds
+    # (a run stopped short counts as no solution); with raise_errors, failures
+    # propagate instead of being logged and returned as (None, None).
     try:
-        # Generate random data
+        if instance is not None:
+            num_customers = len(instance['customer_locations'])
+            num_vehicles = instance['num_vehicles']
+            vehicle_capacity = instance['vehicle_capacity']
+            time_windows = instance['time_windows']
+            if num_goods is None:
+                num_goods = int(max(instance['goods_for_cus'].values(), default=0)) + 1
+
         customers = range(1, num_customers + 1)
         vehicles = range(num_vehicles)
         goods = range(num_goods)
 
-        # Coordinates of depot and customers
-        depot = (4, 4)
         # Customer names
         customer_names = {i: f"ID_{i}" for i in customers}
-        customer_locations = {i: (random.uniform(0, num_customers), random.uniform(0, num_vehicles)) for i in customers}
-        # Generate random integer goods values for each customer
-        unique_goods_values = list(range(num_goods))
-        random.shuffle(unique_goods_values)
-
-        goods_for_cus = {i: unique_goods_values[j % num_goods] for j, i in enumerate(customers)}
+        if instance is not None:
+            depot = instance['depot']
+            customer_locations = instance['customer_locations']
+            goods_for_cus = instance['goods_for_cus']
+        else:
+            # Generate random data: coordinates of depot and customers, and integer goods values
+            depot = (4, 4)
+            customer_locations = {i: (random.uniform(0, num_customers), random.uniform(0, num_vehicles)) for i in customers}
+            unique_goods_values = list(range(num_goods))
+            random.shuffle(unique_goods_values)
+            goods_for_cus = {i: unique_goods_values[j % num_goods] for j, i in enumerate(customers)}
         # Calculate distances between locations
-        distances = {(i, j, k): distance(customer_locations[i], customer_locations[j]) for i in customers for j in customers for k in vehicles if i != j}
-
-        # Create Pyomo model
-        model = pyomo.ConcreteModel()
-
-        # Decision Variables
-        model.x = pyomo.Var(customers, customers, vehicles, domain=pyomo.Binary)
-        model.goods = pyomo.Var(customers, vehicles, domain=pyomo.NonNegativeReals)  # New variable for goods carried
-        model.arrival_time = pyomo.Var(customers, vehicles, domain=pyomo.NonNegativeReals)
-
-        # Objective function: Minimize total distance traveled and total goods carried
-        model.obj = pyomo.Objective(
-            expr=(
-                sum(distances[i, j, k] * model.x[i, j, k] for i in customers for j in customers for k in vehicles if i != j) +
-                sum(goods_for_cus[i] * model.goods[i, k] for i in customers for k in vehicles)
-            ),
-            sense=pyomo.minimize
-        )
-
-        # Ensure that each customer is visited exactly once
-        model.visits_constraint = pyomo.ConstraintList()
-        for i in customers:
-            model.visits_constraint.add(expr=sum(model.x[i, j, k] for j in customers for k in vehicles) == 1)
-
-        # Ensure that each vehicle leaves and arrives at the depot
-        model.depot_constraint = pyomo.ConstraintList()
-        for k in vehicles:
-            model.depot_constraint.add(expr=sum(model.x[i, j, k] for j in customers for k in vehicles) == 1)
-
-        # Ensure that each vehicle's goods capacity is not exceeded
-        vehicle_capacity = 10  # Example capacity, adjust as needed
-        model.capacity_constraint = pyomo.ConstraintList()
-        for k in vehicles:
-            model.capacity_constraint.add(
-                expr=sum(goods_for_cus[i] * model.goods[i, k] for i in customers) <= vehicle_capacity
-            )
+        distances = DistanceMatrix(depot, customer_locations)
 
-        # Time window constraints
-        model.time_window_constraint = pyomo.ConstraintList()
-        for i in customers:
-            time_window = get_user_input_time(i)
-            for k in vehicles:
-                model.time_window_constraint.add(
-                    model.arrival_time[i, k] >= time_window['start']['hour'] * 60 + time_window['start']['minute']
-                )
-                model.time_window_constraint.add(
-                    model.arrival_time[i, k] <= time_window['end']['hour'] * 60 + time_window['end']['minute']
+        # Time windows in minutes from midnight, asked once per customer
+        if time_windows is None:
+            time_windows = {}
+            for i in customers:
+                time_window = get_user_input_time(i)
+                time_windows[i] = (
+                    time_window['start']['hour'] * 60 + time_window['start']['minute'],
+                    time_window['end']['hour'] * 60 + time_window['end']['minute'],
                 )
 
-        # Arrival time constraints
-        M = 10000  # A large constant to represent infinity
-        for i in customers:
-            for j in customers:
-                for k in vehicles:
-                    if i != j:
-                        model.time_constraint = pyomo.Constraint(
-                            expr=model.arrival_time[i, k] + distances[i, j, k] <= model.arrival_time[j, k] + M * (1 - model.x[i, j, k])
-                        )
+        if minimize_vehicles:
+            # The checks rebuild the instance with the class solver for each candidate fleet size
+            fleet = minimize_fleet(VehicleRoutingProblemSolver.from_data(
+                depot, customer_locations, goods_for_cus, time_windows, num_vehicles, vehicle_capacity))
+            num_vehicles = fleet['vehicles']
+            vehicles = range(num_vehicles)
+            proof = "proven minimum" if fleet['proven'] else f"at least {fleet['lower']} needed"
+            print(f"Fleet size: {num_vehicles} vehicles ({proof}) in {fleet['time']:.2f}s")
+
+        # Arcs between the depot (node 0) and customers
+        nodes = [DEPOT_ID] + list(customers)
+        arcs = [(i, j) for i in nodes for j in nodes if i != j]
+        arcs_out = {i: [j for j in nodes if j != i] for i in nodes}
+        arcs_in = {j: [i for i in nodes if i != j] for j in nodes}
+        vehicle_arcs = [(i, j, k) for i, j in arcs if j != DEPOT_ID for k in vehicles]
 
-        # Solve the VRP problem
-        solver = SolverFactory('cbc')
-        results = solver.solve(model, tee=True)
+        # A solution cache (solutionCache.SolutionCache) skips build and solve for known instances
+        key = None
+        cached = None
+        if cache is not None:
+            key = instance_key(depot, customer_locations, time_windows, goods_for_cus, num_vehicles, vehicle_capacity,
+                               {'formulation': 'three_index', 'metric': 'euclidean'})
+            cached = cache.get(key)
+
+        if cached is not None:
+            print(f"Solution cache hit ({key[:12]})")
+            routes, objective = cached['routes'], cached['objective']
+        else:
+            build_start = time.perf_counter()
+
+            # Create Pyomo model
+            model = pyomo.ConcreteModel()
+
+            # Decision Variables
+            model.x = pyomo.Var([(i, j, k) for i, j in arcs for k in vehicles], domain=pyomo.Binary)
+            model.goods = pyomo.Var(customers, vehicles, bounds=(0, vehicle_capacity))  # Goods on board after serving i
+            model.arrival_time = pyomo.Var(customers, vehicles, bounds=lambda m, i, k: time_windows[i])
+
+            # Objective function: Minimize total distance traveled
+            model.obj = pyomo.Objective(
+                expr=sum(distances[i, j] * model.x[i, j, k] for i, j in arcs for k in vehicles),
+                sense=pyomo.minimize
+            )
+
+            # Ensure that each customer is visited exactly once
+            model.visits_constraint = pyomo.Constraint(
+                customers, rule=lambda m, i: sum(m.x[i, j, k] for j in arcs_out[i] for k in vehicles) == 1
+            )
+            model.flow_constraint = pyomo.Constraint(
+                nodes, vehicles, rule=lambda m, i, k: sum(m.x[i, j, k] for j in arcs_out[i]) == sum(m.x[j, i, k] for j in arcs_in[i])
+            )
+
+            # Ensure that each vehicle leaves and arrives at the depot at most once
+            model.depot_constraint = pyomo.Constraint(
+                vehicles, rule=lambda m, k: sum(m.x[DEPOT_ID, j, k] for j in arcs_out[DEPOT_ID]) <= 1
+            )
+
+            # Ensure that each vehicle's goods capacity is not exceeded
+            model.capacity_constraint = pyomo.Constraint(
+                vehicles, rule=lambda m, k: sum(goods_for_cus[i] * m.x[i, j, k] for i in customers for j in arcs_out[i]) <= vehicle_capacity
+            )
+
+            def load_rule(m, i, j, k):
+                if i == DEPOT_ID:
+                    return m.goods[j, k] >= goods_for_cus[j] * m.x[i, j, k]
+                return m.goods[j, k] - m.goods[i, k] - vehicle_capacity * m.x[i, j, k] >= goods_for_cus[j] - vehicle_capacity
+            model.load_constraint = pyomo.Constraint(vehicle_arcs, rule=load_rule)
+
+            # Arrival time constraints (time windows are the arrival_time bounds, big-M per arc comes from them)
+            def arrival_time_rule(m, i, j, k):
+                if i == DEPOT_ID:
+                    return m.arrival_time[j, k] >= distances[i, j] * m.x[i, j, k]
+                big_m = max(0.0, time_windows[i][1] + distances[i, j] - time_windows[j][0])
+                return m.arrival_time[j, k] - m.arrival_time[i, k] - big_m * m.x[i, j, k] >= distances[i, j] - big_m
+            model.time_constraint = pyomo.Constraint(vehicle_arcs, rule=arrival_time_rule)
+
+            print(f"Model build time: {time.perf_counter() - build_start:.3f}s")
+
+            # Solve the VRP problem
+            solver = SolverFactory('cbc')
+            if time_limit is not None:
+                solver.options['seconds'] = time_limit
+            results = solver.solve(model, tee=True)
+
+            routes, objective = None, None
+            if results.solver.termination_condition == pyomo.TerminationCondition.optimal:
+                objective = pyomo.value(model.obj)
+                routes = ordered_arcs(active_indices(model.x), 'three_index', num_vehicles)
+                if key is not None:
+                    cache.put(key, routes, objective)
 
         # Display results
         print("\nRESULTS\n")
 
-        print("Total distance traveled:", sum(distances[i, j, k] + pyomo.value(model.x[i, j, k]) for i in customers for j in customers for k in vehicles if i != j))
         print("Goods: ", goods_for_cus)
         
-        if results.solver.termination_condition == pyomo.TerminationCondition.optimal:
+        if routes is not None:
+            print("Total distance traveled:", objective)
+
             # Display the routes
-            routes = []
-            for k in vehicles:
-                route = [(i, j) for i in customers for j in customers if pyomo.value(model.x[i, j, k])]
-                routes.append(route)
+            for k, route in enumerate(routes):
                 print(f"Vehicle {k + 1} route: {[customer_names[i] for i, j in route]}")
 
             # Plot the routes
             plot_routes(routes, depot, customer_locations)
             
-             # Write input data to JSON file
+            # Append the request and its solution to the record store
             input_data = {
                 "num_customers": num_customers,
                 "num_vehicles": num_vehicles,
                 "num_goods": num_goods,
-                "time_for_sent": {i: get_user_input_time(i) for i in customers}
+                "depot": depot,
+                "customer_locations": customer_locations,
+                "goods_for_cus": goods_for_cus,
+                "vehicle_capacity": vehicle_capacity,
+                "time_for_sent": {i: {'start': {'hour': start // 60, 'minute': start % 60}, 'end': {'hour': end // 60, 'minute': end % 60}} for i, (start, end) in time_windows.items()}
             }
-            write_input_data_to_json(input_data)
+            record_solve(input_data, {'status': 'optimal', 'objective': objective,
+                                      'routes': [[i for i, _ in route] for route in routes]})
         else:
             print("Solver did not find an optimal solution. Check the model and solver settings.")
+        return routes, objective
 
     except Exception as e:
         # Log the exception
         logging.error("An error occurred: %s", str(e))
+        if raise_errors:
+            raise
+        return None, None
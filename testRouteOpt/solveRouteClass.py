@@ -0,0 +1,764 @@
+import pyomo.environ as pyomo
+from pyomo.opt import SolverFactory
+import random
+import time
+from testFuncTime import plot_routes, get_user_input_time
+from distanceMatrix import DistanceMatrix, DEPOT_ID
+from matrixModel import VRPMatrixModel
+from persistentSession import PERSISTENT_SOLVERS, RoutingSession, persistent_available, set_threads
+from pyomo.contrib.appsi.base import TerminationCondition as PersistentTermination
+from routeHeuristics import initial_routes
+from alnsSolver import solve_alns
+from clusterSolve import solve_clustered
+from solverPortfolio import STATS_FILE, race
+from fleetSizing import FLEET_CHECK_TIME, minimize_fleet
+from cutLoop import CutLoop
+from arcPruning import prune_arcs
+from granularArcs import GRANULAR_NEIGHBOURS, granular_arcs
+from solutionCache import instance_key
+from instanceLoader import load_instances, time_for_sent
+from recordStore import record_solve
+from solveMetrics import CapturedOutput, SolveMetrics
+from routeExtraction import active_arcs, make_route, ordered_routes
+import contextlib
+import os
+import sys
+import tempfile
+import hashlib
+import logging
+
+# Model builders selectable through VehicleRoutingProblemSolver(formulation=...)
+FORMULATIONS = ('three_index', 'two_index')
+
+# 'pyomo' builds expression trees; 'matrix' emits sparse arrays (matrixModel.VRPMatrixModel)
+ASSEMBLIES = ('pyomo', 'matrix')
+
+# MIP solvers for the Pyomo model through Pyomo's shell interface, with each
+# one's option names for the time limit, relative gap and thread count
+SHELL_SOLVERS = {
+    'cbc': {'time_limit': 'seconds', 'mip_rel_gap': 'ratio', 'threads': 'threads'},
+    'glpk': {'time_limit': 'tmlim', 'mip_rel_gap': 'mipgap'},
+}
+
+# In-process solvers (persistentSession.PERSISTENT_SOLVERS) fall back to this
+# shell solver when their library is not installed
+FALLBACK_SOLVER = 'cbc'
+
+# Depot opening hours in minutes from midnight
+DEPOT_WINDOW = (0, 24 * 60)
+
+# Relative gap up to which a solve counts as optimal (the HiGHS and CBC default);
+# a looser mip_rel_gap stop is reported as 'feasible'
+OPTIMALITY_GAP = 1e-4
+
+class VehicleRoutingProblemSolver:
+    def __init__(self, num_customers, num_vehicles, num_goods, metric='euclidean', road_network=None, formulation='three_index', assembly='pyomo', data=None, cache=None, metrics_sink=None, trace_memory=False,
+                 time_limit=None, mip_rel_gap=None, threads=None, solver='highs'):
+        if formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation '{formulation}', use one of {FORMULATIONS}")
+        if assembly not in ASSEMBLIES:
+            raise ValueError(f"Unknown assembly '{assembly}', use one of {ASSEMBLIES}")
+        if solver not in SHELL_SOLVERS and solver not in PERSISTENT_SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', use one of {sorted({**SHELL_SOLVERS, **PERSISTENT_SOLVERS})}")
+
+        # Phase timings and solver statistics (solveMetrics.SolveMetrics); each
+        # solve() hands a record to metrics_sink, any callable taking a dict
+        self.metrics = SolveMetrics(metrics_sink, trace_memory)
+
+        self.formulation = formulation
+        self.assembly = assembly
+        self.num_customers = num_customers
+        self.num_vehicles = num_vehicles
+        self.num_goods = num_goods
+
+        self.customers = range(1, num_customers + 1)
+        self.vehicles = range(num_vehicles)
+        self.goods = range(num_goods)
+
+        self.customer_names = {i: f"ID_{i}" for i in self.customers}
+        with self.metrics.phase('generate'):
+            if data is None:
+                self.depot = (4, 4)
+                self.customer_locations = {i: (random.uniform(0, num_customers), random.uniform(0, num_vehicles)) for i in self.customers}
+                unique_goods_values = list(range(num_goods))
+                random.shuffle(unique_goods_values)
+
+                self.goods_for_cus = {i: unique_goods_values[j % num_goods] for j, i in enumerate(self.customers)}
+                self.vehicle_capacity = 10  # Example capacity, adjust as needed
+                self.time_windows = None
+            else:
+                # Given instance (see from_data), customers are numbered 1..num_customers
+                self.depot = data['depot']
+                self.customer_locations = dict(data['customer_locations'])
+                self.goods_for_cus = dict(data['goods_for_cus'])
+                self.vehicle_capacity = data.get('vehicle_capacity', 10)
+                self.time_windows = dict(data['time_windows']) if data.get('time_windows') is not None else None
+
+        self.metric = metric
+        self.road_network = road_network
+        self.refresh_distances()
+
+        # Optional solutionCache.SolutionCache shared between solver instances
+        self.cache = cache
+
+        self.depot_window = DEPOT_WINDOW
+        self.build_time = None
+        self.matrix_model = None
+        self.matrix_solution = None
+        self.warm_start = False
+        self.heuristic_objective = None
+        # Default limits for solve(): seconds, relative gap to stop at, solver threads
+        self.time_limit = time_limit
+        self.mip_rel_gap = mip_rel_gap
+        self.threads = threads
+        # Solver for the Pyomo model: in-process for PERSISTENT_SOLVERS, through
+        # the shell for SHELL_SOLVERS. The matrix assembly always uses scipy's HiGHS.
+        self.solver = solver
+        self.solve_time = None
+        # After a solve: 'optimal', 'feasible' (stopped at a limit), 'infeasible'
+        # (proven to have no solution) or 'no_solution' (none found within the limits),
+        # with the achieved relative gap and the best proven lower bound
+        self.solve_status = None
+        self.mip_gap = None
+        self.bound = None
+        self.cut_stats = None
+        self.pruning_report = None
+        # Windows tightened by preprocess(), for the model builders and
+        # heuristics; self.time_windows keeps the requested ones
+        self.model_windows = None
+        # The arcs preprocess() pruned, to prune again after an edit relaxes the instance
+        self.unpruned_arcs = None
+
+        self.routes = None
+        self.objective = None
+
+        self.model = pyomo.ConcreteModel()
+
+    @classmethod
+    def from_data(cls, depot, customer_locations, goods_for_cus, time_windows, num_vehicles, vehicle_capacity=10, **options):
+        # Solver for a given instance; customer IDs must be 1..n and time
+        # windows are (start, end) in minutes from midnight
+        data = {
+            'depot': depot,
+            'customer_locations': customer_locations,
+            'goods_for_cus': goods_for_cus,
+            'time_windows': time_windows,
+            'vehicle_capacity': vehicle_capacity,
+        }
+        num_goods = int(max(goods_for_cus.values(), default=0)) + 1
+        return cls(len(customer_locations), num_vehicles, num_goods, data=data, **options)
+
+    @classmethod
+    def from_file(cls, path, index=0, seed=None, num_vehicles=None, vehicle_capacity=10, **options):
+        # Solver for instance `index` of a JSON/JSONL/CSV file (see instanceLoader),
+        # validated and with windows in minutes; nothing is asked on the console
+        for n, instance in enumerate(load_instances(path, seed, num_vehicles, vehicle_capacity)):
+            if n == index:
+                return cls.from_data(**instance, **options)
+        raise IndexError(f"{path} has no instance {index}")
+
+    def refresh_distances(self):
+        # (Re)compute the matrices, nodes and arcs for the current customer locations
+        with self.metrics.phase('distances'):
+            if self.road_network is not None:
+                # Road distances and travel times from a local OSM extract (roadNetwork.RoadNetwork)
+                self.distances, self.travel_times = self.road_network.matrices(self.depot, self.customer_locations)
+            else:
+                self.distances = DistanceMatrix(self.depot, self.customer_locations, self.metric)
+                self.travel_times = self.distances
+
+        self.nodes = [DEPOT_ID] + list(self.customers)
+        self.arcs = [(i, j) for i in self.nodes for j in self.nodes if i != j]
+
+    def get_time_windows(self):
+        # Time windows in minutes from midnight, asked once per customer
+        if self.time_windows is None:
+            self.time_windows = {}
+            for i in self.customers:
+                time_window = get_user_input_time(i)
+                self.time_windows[i] = (
+                    time_window['start']['hour'] * 60 + time_window['start']['minute'],
+                    time_window['end']['hour'] * 60 + time_window['end']['minute'],
+                )
+        return self.time_windows
+
+    def get_model_windows(self):
+        # Windows the model is built on: the tightened ones after preprocess()
+        if self.model_windows is None:
+            return self.get_time_windows()
+        return self.model_windows
+
+    def preprocess(self):
+        # Tighten windows and drop arcs no feasible route can use (see arcPruning);
+        # call before build_model, the builders only see the remaining arcs
+        self.unpruned_arcs = list(self.arcs)
+        self.arcs, self.model_windows, self.pruning_report = prune_arcs(self)
+        report = self.pruning_report
+        print(f"Preprocessing removed {report['arcs_removed']} arcs "
+              f"({report['capacity_arcs']} by capacity, {report['time_window_arcs']} by time windows), "
+              f"{report['variables_removed']} variables and {report['constraints_removed']} constraints; "
+              f"{report['windows_tightened']} windows tightened")
+        return report
+
+    def use_granular_arcs(self, k=GRANULAR_NEIGHBOURS):
+        # Keep only arcs between each customer and its k nearest neighbours, plus
+        # depot arcs (see granularArcs); the model builders and heuristics follow
+        total = len(self.arcs)
+        self.arcs = granular_arcs(self, k)
+        print(f"Granular arc set: kept {len(self.arcs)} of {total} arcs (k={k})")
+        return self.arcs
+
+    def build_model(self):
+        build_start = time.perf_counter()
+        if self.assembly == 'matrix':
+            with self.metrics.phase('assembly'):
+                self.matrix_model = VRPMatrixModel(self)
+            self.build_time = time.perf_counter() - build_start
+            self.metrics.counts.update(variables=self.matrix_model.shape[1], constraints=self.matrix_model.shape[0])
+            print(f"Model build time: {self.build_time:.3f}s ({self.matrix_model.shape[1]} variables, {self.matrix_model.shape[0]} constraints)")
+            return
+        if self.formulation == 'two_index':
+            builders = (self.create_two_index_variables, self.create_two_index_objective, self.create_two_index_constraints)
+        else:
+            builders = (self.create_variables, self.create_objective, self.create_constraints)
+        for phase, builder in zip(('variables', 'objective', 'constraints'), builders):
+            with self.metrics.phase(phase):
+                builder()
+        self.build_time = time.perf_counter() - build_start
+        self.metrics.counts.update(variables=self.model.nvariables(), constraints=self.model.nconstraints())
+        print(f"Model build time: {self.build_time:.3f}s ({self.model.nvariables()} variables, {self.model.nconstraints()} constraints)")
+
+    def arc_lists(self):
+        # Successors and predecessors of every node in the current arc set
+        arcs_out = {i: [] for i in self.nodes}
+        arcs_in = {j: [] for j in self.nodes}
+        for i, j in self.arcs:
+            arcs_out[i].append(j)
+            arcs_in[j].append(i)
+        return arcs_out, arcs_in
+
+    def arc_big_m(self, i, j):
+        # Smallest M that keeps arrival_time[j] >= arrival_time[i] + t(i, j) inactive when the arc is unused
+        time_windows = self.get_model_windows()
+        return max(0.0, time_windows[i][1] + self.travel_times[i, j] - time_windows[j][0])
+
+    # Three-index formulation: x[i, j, k] = 1 when vehicle k drives from i to j
+    def create_variables(self):
+        time_windows = self.get_model_windows()
+        self.model.x = pyomo.Var([(i, j, k) for i, j in self.arcs for k in self.vehicles], domain=pyomo.Binary)
+        self.model.goods = pyomo.Var(self.customers, self.vehicles, bounds=(0, self.vehicle_capacity))  # Goods on board after serving i
+        self.model.arrival_time = pyomo.Var(self.customers, self.vehicles, bounds=lambda m, i, k: time_windows[i])
+
+    def create_objective(self):
+        self.model.obj = pyomo.Objective(
+            expr=sum(self.distances[i, j] * self.model.x[i, j, k] for i, j in self.arcs for k in self.vehicles),
+            sense=pyomo.minimize
+        )
+
+    def create_constraints(self):
+        self.create_visits_constraint()
+        self.create_depot_constraint()
+        self.create_capacity_constraint()
+        self.create_arrival_time_constraints()
+
+    def create_visits_constraint(self):
+        arcs_out, arcs_in = self.arc_lists()
+
+        # Each customer is left exactly once by some vehicle
+        self.model.visits_constraint = pyomo.Constraint(
+            self.customers,
+            rule=lambda m, i: sum(m.x[i, j, k] for j in arcs_out[i] for k in self.vehicles) == 1
+        )
+        # A vehicle that enters a node also leaves it
+        self.model.flow_constraint = pyomo.Constraint(
+            self.nodes, self.vehicles,
+            rule=lambda m, i, k: sum(m.x[i, j, k] for j in arcs_out[i]) == sum(m.x[j, i, k] for j in arcs_in[i])
+        )
+
+    def create_depot_constraint(self):
+        arcs_out, _ = self.arc_lists()
+
+        # Each vehicle leaves the depot at most once
+        self.model.depot_constraint = pyomo.Constraint(
+            self.vehicles,
+            rule=lambda m, k: sum(m.x[DEPOT_ID, j, k] for j in arcs_out[DEPOT_ID]) <= 1
+        )
+
+    def create_capacity_constraint(self):
+        self.model.capacity_constraint = pyomo.Constraint(self.vehicles, rule=self.capacity_rule)
+        self.model.load_constraint = pyomo.Constraint(
+            [(i, j, k) for i, j in self.arcs if j != DEPOT_ID for k in self.vehicles], rule=self.load_rule
+        )
+
+    def create_arrival_time_constraints(self):
+        # Time windows are the bounds of arrival_time; big-M per arc comes from them too
+        self.model.time_constraint = pyomo.Constraint(
+            [(i, j, k) for i, j in self.arcs if j != DEPOT_ID for k in self.vehicles], rule=self.arrival_time_rule
+        )
+
+    # Rules for the data-dependent rows, also used to regenerate single rows (persistentSession)
+    def capacity_rule(self, m, k):
+        arcs_out, _ = self.arc_lists()
+        return sum(self.goods_for_cus[i] * m.x[i, j, k] for i in self.customers for j in arcs_out[i]) <= self.vehicle_capacity
+
+    def load_rule(self, m, i, j, k):
+        # Load flow: goods on board grow by the demand of each next customer
+        Q = self.vehicle_capacity
+        if i == DEPOT_ID:
+            return m.goods[j, k] >= self.goods_for_cus[j] * m.x[i, j, k]
+        return m.goods[j, k] - m.goods[i, k] - Q * m.x[i, j, k] >= self.goods_for_cus[j] - Q
+
+    def arrival_time_rule(self, m, i, j, k):
+        if i == DEPOT_ID:
+            return m.arrival_time[j, k] >= self.depot_window[0] + self.travel_times[i, j] * m.x[i, j, k]
+        big_m = self.arc_big_m(i, j)
+        return m.arrival_time[j, k] - m.arrival_time[i, k] - big_m * m.x[i, j, k] >= self.travel_times[i, j] - big_m
+
+    # Two-index (arc-based) formulation: one binary per arc shared by the whole
+    # fleet, with load and arrival-time flow variables per customer
+    def create_two_index_variables(self):
+        time_windows = self.get_model_windows()
+        self.model.x = pyomo.Var(self.arcs, domain=pyomo.Binary)
+        self.model.goods = pyomo.Var(self.customers, bounds=lambda m, i: (self.goods_for_cus[i], self.vehicle_capacity))  # Load after serving i
+        self.model.arrival_time = pyomo.Var(self.customers, bounds=lambda m, i: time_windows[i])
+
+    def create_two_index_objective(self):
+        self.model.obj = pyomo.Objective(
+            expr=sum(self.distances[i, j] * self.model.x[i, j] for i, j in self.arcs),
+            sense=pyomo.minimize
+        )
+
+    def create_two_index_constraints(self):
+        model = self.model
+        arcs_out, arcs_in = self.arc_lists()
+        customer_arcs = [(i, j) for i, j in self.arcs if i != DEPOT_ID and j != DEPOT_ID]
+        arrival_arcs = [(i, j) for i, j in self.arcs if j != DEPOT_ID]
+
+        # Every customer is left and entered exactly once
+        model.out_degree_constraint = pyomo.Constraint(self.customers, rule=lambda m, i: sum(m.x[i, j] for j in arcs_out[i]) == 1)
+        model.in_degree_constraint = pyomo.Constraint(self.customers, rule=lambda m, j: sum(m.x[i, j] for i in arcs_in[j]) == 1)
+
+        # At most num_vehicles routes leave the depot, and all of them come back
+        model.fleet_constraint = pyomo.Constraint(expr=sum(model.x[DEPOT_ID, j] for j in arcs_out[DEPOT_ID]) <= self.num_vehicles)
+        model.depot_constraint = pyomo.Constraint(
+            expr=sum(model.x[DEPOT_ID, j] for j in arcs_out[DEPOT_ID]) == sum(model.x[i, DEPOT_ID] for i in arcs_in[DEPOT_ID])
+        )
+
+        # Load and time flow, with big-M per arc taken from the time windows
+        model.load_constraint = pyomo.Constraint(customer_arcs, rule=self.two_index_load_rule)
+        model.time_constraint = pyomo.Constraint(arrival_arcs, rule=self.two_index_arrival_time_rule)
+
+    def two_index_load_rule(self, m, i, j):
+        Q = self.vehicle_capacity
+        return m.goods[j] - m.goods[i] - Q * m.x[i, j] >= self.goods_for_cus[j] - Q
+
+    def two_index_arrival_time_rule(self, m, i, j):
+        if i == DEPOT_ID:
+            return m.arrival_time[j] >= self.depot_window[0] + self.travel_times[i, j] * m.x[i, j]
+        big_m = self.arc_big_m(i, j)
+        return m.arrival_time[j] - m.arrival_time[i] - big_m * m.x[i, j] >= self.travel_times[i, j] - big_m
+
+    def apply_construction_heuristic(self, method='savings'):
+        # Build routes with routeHeuristics and load them as the MIP start
+        heuristic_start = time.perf_counter()
+        routes, total_distance, feasible = initial_routes(self, method)
+        print(f"{method} heuristic: {len(routes)} routes, distance {total_distance:.2f} in {time.perf_counter() - heuristic_start:.3f}s")
+        if not feasible:
+            print("Heuristic routes do not fit the fleet, solving without a MIP start.")
+            return None
+        self.heuristic_objective = total_distance
+        self.set_warm_start(routes)
+        return routes
+
+    def set_warm_start(self, routes):
+        # Initial values for x, goods and arrival_time from routes given as customer ID sequences
+        if self.assembly == 'matrix':
+            print("The matrix assembly path has no MIP start, ignoring warm start.")
+            return
+        model = self.model
+        time_windows = self.get_model_windows()
+        two_index = self.formulation == 'two_index'
+
+        for var in model.x.values():
+            var.set_value(0)
+        for i in self.customers:
+            for k in ([None] if two_index else self.vehicles):
+                idx = i if two_index else (i, k)
+                model.goods[idx].set_value(self.goods_for_cus[i])
+                model.arrival_time[idx].set_value(time_windows[i][0])
+
+        for k, route in enumerate(routes):
+            load, clock, previous = 0, self.depot_window[0], DEPOT_ID
+            for i in route + [DEPOT_ID]:
+                model.x[(previous, i) if two_index else (previous, i, k)].set_value(1)
+                if i != DEPOT_ID:
+                    load += self.goods_for_cus[i]
+                    clock = max(time_windows[i][0], clock + self.travel_times[previous, i])
+                    idx = i if two_index else (i, k)
+                    model.goods[idx].set_value(load)
+                    model.arrival_time[idx].set_value(clock)
+                previous = i
+        self.warm_start = True
+
+    def solve_with_alns(self, time_limit=10.0, seed=None):
+        # Pure NumPy backend for instances the MIP cannot handle (see alnsSolver)
+        alns_start = time.perf_counter()
+        routes, total_distance, unassigned = solve_alns(self, time_limit, seed)
+
+        print("\nRESULTS (ALNS)\n")
+        print(f"Search time: {time.perf_counter() - alns_start:.2f}s")
+        print("Total distance traveled:", total_distance)
+        for k, route in enumerate(routes):
+            print(f"Vehicle {k + 1} route: {[self.customer_names[i] for i, j in route]}")
+        if unassigned:
+            print("Customers that could not be served:", [self.customer_names[i] for i in unassigned])
+
+        with self.metrics.phase('plot'):
+            plot_routes(routes, self.depot, self.customer_locations)
+        return routes
+
+    def solve_by_clusters(self, method='sweep', backend='mip', workers=None, time_limit=10.0, seed=None):
+        # Cluster-first, route-second across a process pool (see clusterSolve)
+        cluster_start = time.perf_counter()
+        routes, total_distance, unserved = solve_clustered(self, method, backend, workers, time_limit, seed)
+
+        print(f"\nRESULTS ({method} clusters, {backend})\n")
+        print(f"Solve time: {time.perf_counter() - cluster_start:.2f}s")
+        print("Total distance traveled:", total_distance)
+        for k, route in enumerate(routes):
+            print(f"Vehicle {k + 1} route: {[self.customer_names[i] for i, j in route]}")
+        if unserved:
+            print("Customers that could not be served:", [self.customer_names[i] for i in unserved])
+
+        with self.metrics.phase('plot'):
+            plot_routes(routes, self.depot, self.customer_locations)
+        return routes
+
+    def minimize_fleet_size(self, time_limit=FLEET_CHECK_TIME, workers=None, seed=None):
+        # Shrink the fleet to the fewest vehicles that serve every customer (see
+        # fleetSizing), checking candidate sizes in parallel processes. Call
+        # before build_model; num_vehicles is then the fleet the model gets.
+        available = self.num_vehicles
+        outcome = minimize_fleet(self, time_limit, workers, seed)
+        self.num_vehicles = outcome['vehicles']
+        self.vehicles = range(self.num_vehicles)
+        proof = "proven minimum" if outcome['proven'] else f"at least {outcome['lower']} needed"
+        print(f"Fleet size: {self.num_vehicles} vehicles ({proof}; bounds: capacity {outcome['bounds']['capacity']}, "
+              f"time windows {outcome['bounds']['time_windows']}, savings {outcome['bounds']['savings']}) "
+              f"in {outcome['time']:.2f}s")
+        if self.num_vehicles > available:
+            logging.warning("The instance needs %d vehicles, %d are available", self.num_vehicles, available)
+        return outcome
+
+    def solve_with_portfolio(self, backends=None, time_limit=60.0, mip_rel_gap=None, stats_path=STATS_FILE):
+        # Race the installed MIP backends in parallel processes (see solverPortfolio)
+        outcome = race(self, backends, time_limit, mip_rel_gap, stats_path)
+        self.solve_time = outcome['race_time']
+        self.solve_status, self.mip_gap, self.bound = outcome['status'], outcome['gap'], outcome['bound']
+        self.objective = outcome['objective']
+        self.routes = None
+        if outcome['routes'] is not None:
+            self.routes = [make_route(self, [tuple(arc) for arc in route], k) for k, route in enumerate(outcome['routes'])]
+
+        print("\nRESULTS (portfolio)\n")
+        for name, result in outcome['entrants'].items():
+            print(f"{name}: {result['status']}, objective {result.get('objective')}, {result.get('time', 0.0):.2f}s")
+        print(f"Winner: {outcome['winner']} in {self.solve_time:.2f}s")
+        if self.routes is None:
+            logging.error("Portfolio race found no feasible solution")
+            return None
+
+        print("Total distance traveled:", self.objective)
+        for k, route in enumerate(self.routes):
+            print(f"Vehicle {k + 1} route: {[self.customer_names[i] for i, j in route]}")
+        with self.metrics.phase('plot'):
+            plot_routes(self.routes, self.depot, self.customer_locations)
+        return self.routes
+
+    def solve_with_cuts(self, time_limit=None):
+        # MIP without the big-M load/arrival rows; subtour, capacity and
+        # infeasible-path cuts are added only once a solution violates them (see cutLoop)
+        loop = CutLoop(self)
+        cut_start = time.perf_counter()
+        routes = loop.solve(time_limit)
+        if routes is not None:
+            routes = [make_route(self, route, k) for k, route in enumerate(routes)]
+        self.solve_time = time.perf_counter() - cut_start
+        self.cut_stats = loop.stats
+        self.solve_status = loop.status
+        self.routes, self.objective = routes, loop.objective
+
+        print("\nRESULTS (lazy cuts)\n")
+        for record in loop.stats:
+            cuts = ", ".join(f"{record.get(kind, 0)} {kind}" for kind in ('subtour', 'capacity', 'path'))
+            if record.get('fallback'):
+                print(f"Big-M fallback: {record['solve_time']:.3f}s, {record['rows']} rows, objective {record['objective']}")
+            else:
+                print(f"Iteration {record['iteration']}: {record['solve_time']:.3f}s, {record['rows']} rows, objective {record['objective']}, cuts added: {cuts}")
+        print(f"Solve time: {self.solve_time:.2f}s ({loop.status})")
+        if routes is None:
+            logging.error("Cut loop stopped without a solution (%s)", loop.stats[-1]['status'] if loop.stats else 'no time left')
+            return None
+
+        print("Total distance traveled:", self.objective)
+        for k, route in enumerate(routes):
+            print(f"Vehicle {k + 1} route: {[self.customer_names[i] for i, j in route]}")
+        with self.metrics.phase('plot'):
+            plot_routes(routes, self.depot, self.customer_locations)
+        return routes
+
+    def start_session(self, solver='highs'):
+        # Persistent solver for edit-and-resolve (see persistentSession.RoutingSession)
+        return RoutingSession(self, solver)
+
+    def active_arcs(self):
+        # Arcs with x = 1: (i, j) for the two-index model, (i, j, k) otherwise
+        return active_arcs(self)
+
+    def extract_routes(self):
+        # One routeExtraction.Route per vehicle: arcs in driving order with
+        # arrival times and loads
+        return ordered_routes(self)
+
+    def cache_key(self):
+        # Everything that changes the optimal routes, see solutionCache.instance_key
+        full = len(self.arcs) == len(self.nodes) * (len(self.nodes) - 1)
+        settings = {
+            'formulation': self.formulation,
+            'metric': self.metric,
+            'road_network': self.road_network.source_key if self.road_network is not None else None,
+            'depot_window': list(self.depot_window),
+            'arcs': 'all' if full else hashlib.sha1(repr(sorted(self.arcs)).encode()).hexdigest(),
+        }
+        return instance_key(self.depot, self.customer_locations, self.get_time_windows(), self.goods_for_cus,
+                            self.num_vehicles, self.vehicle_capacity, settings)
+
+    def model_built(self):
+        if self.assembly == 'matrix':
+            return self.matrix_model is not None
+        return self.model.component('obj') is not None
+
+    def solve(self, tee=False, time_limit=None, mip_rel_gap=None, threads=None):
+        # Run the solver on the built model; returns the routes of the best solution
+        # found, or None without a feasible one. Limits default to the ones given to
+        # the constructor. A run stopped by a limit leaves solve_status 'feasible',
+        # with mip_gap and bound saying how far from proven optimal the routes may be.
+        # With a cache, a known instance returns its stored routes without building or solving.
+        time_limit = self.time_limit if time_limit is None else time_limit
+        mip_rel_gap = self.mip_rel_gap if mip_rel_gap is None else mip_rel_gap
+        threads = self.threads if threads is None else threads
+        solve_start = time.perf_counter()
+        key = self.cache_key() if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                # Same Route objects as a fresh solve, schedules recomputed
+                self.routes = [make_route(self, [tuple(arc) for arc in route], k) for k, route in enumerate(cached['routes'])]
+                self.objective = cached['objective']
+                self.solve_status, self.mip_gap, self.bound = 'optimal', 0.0, self.objective
+                self.solve_time = time.perf_counter() - solve_start
+                self.metrics.status, self.metrics.objective = 'cached', self.objective
+                self.metrics.emit()
+                print(f"Solution cache hit ({key[:12]})")
+                return self.routes
+        if not self.model_built():
+            self.build_model()
+
+        if self.assembly == 'matrix':
+            # scipy's HiGHS takes the arrays directly, no model file is written.
+            # scipy has no thread option, `threads` only applies to the Pyomo model's solver.
+            with self.metrics.phase('solve'):
+                result = self.matrix_model.solve(time_limit=time_limit, mip_gap=mip_rel_gap, disp=tee)
+            self.matrix_solution = result.x
+            # Status 1 is a time or node limit; x is then the best incumbent, if any.
+            # Status 2 is a proof of infeasibility.
+            if result.status == 0:
+                self.solve_status = 'optimal'
+            elif result.x is not None:
+                self.solve_status = 'feasible'
+            else:
+                self.solve_status = 'infeasible' if result.status == 2 else 'no_solution'
+            self.mip_gap = getattr(result, 'mip_gap', None)
+            self.bound = getattr(result, 'mip_dual_bound', None)
+            self.metrics.solver.update(
+                solver='highs', interface='memory', termination=result.message, nodes=getattr(result, 'mip_node_count', None),
+                gap=self.mip_gap, dual_bound=self.bound,
+                # scipy reports no intermediate incumbents, only the final one
+                incumbents=[(self.metrics.phases['solve']['time'], float(result.fun))] if result.x is not None else [],
+            )
+        else:
+            solver, interface = self.pyomo_solver()
+            if interface == 'memory':
+                self.solve_status = self.solve_in_memory(solver, tee, time_limit, mip_rel_gap, threads)
+            else:
+                self.solve_status = self.solve_with_shell(solver, tee, time_limit, mip_rel_gap, threads)
+        if self.solve_status == 'optimal' and self.mip_gap is not None and self.mip_gap > OPTIMALITY_GAP:
+            self.solve_status = 'feasible'
+        self.solve_time = time.perf_counter() - solve_start
+
+        if self.solve_status in ('no_solution', 'infeasible'):
+            self.routes, self.objective = None, None
+            self.metrics.status, self.metrics.objective = self.solve_status, None
+            self.metrics.emit()
+            return None
+        with self.metrics.phase('extract'):
+            self.routes = self.extract_routes()
+        self.objective = result.fun if self.assembly == 'matrix' else pyomo.value(self.model.obj)
+        self.metrics.status, self.metrics.objective = self.solve_status, self.objective
+        self.metrics.emit()
+        # Limit-dependent incumbents are not worth remembering
+        if key is not None and self.solve_status == 'optimal':
+            self.cache.put(key, self.routes, self.objective)
+        return self.routes
+
+    def pyomo_solver(self):
+        # (solver, 'memory' or 'shell') used for the Pyomo model
+        if self.solver in PERSISTENT_SOLVERS:
+            if persistent_available(self.solver):
+                return self.solver, 'memory'
+            logging.warning("In-process solver '%s' is not installed, using %s through the shell", self.solver, FALLBACK_SOLVER)
+            return FALLBACK_SOLVER, 'shell'
+        return self.solver, 'shell'
+
+    def solve_in_memory(self, solver_name, tee=False, time_limit=None, mip_rel_gap=None, threads=None):
+        # Hand the model to an in-process solver library (Pyomo APPSI): no problem
+        # file, no subprocess, the solution is read straight from memory.
+        # Returns the solve status (see solve).
+        solver = PERSISTENT_SOLVERS[solver_name]()
+        solver.config.stream_solver = tee
+        solver.config.time_limit = time_limit
+        solver.config.mip_gap = mip_rel_gap
+        solver.config.warmstart = self.warm_start
+        solver.config.load_solution = False
+        if threads is not None:
+            set_threads(solver, solver_name, threads)
+        with self.metrics.phase('write'):
+            solver.set_instance(self.model)
+        with self.metrics.phase('solve'):
+            results = solver.solve(self.model)
+
+        optimal = results.termination_condition == PersistentTermination.optimal
+        upper, lower = results.best_feasible_objective, results.best_objective_bound
+        if upper is None:
+            status = 'infeasible' if results.termination_condition == PersistentTermination.infeasible else 'no_solution'
+        else:
+            status = 'optimal' if optimal else 'feasible'
+            with self.metrics.phase('load'):
+                results.solution_loader.load_vars()
+        self.bound = lower
+        self.mip_gap = abs(upper - lower) / max(abs(upper), 1e-10) if upper is not None and lower is not None else None
+        self.metrics.solver.update(
+            solver=solver_name, interface='memory', termination=str(results.termination_condition),
+            gap=self.mip_gap, dual_bound=self.bound,
+            # APPSI reports no intermediate incumbents, only the final one
+            incumbents=[(self.metrics.phases['solve']['time'], upper)] if upper is not None else [],
+        )
+        return status
+
+    def solve_with_shell(self, solver_name, tee=False, time_limit=None, mip_rel_gap=None, threads=None):
+        # A solver executable through Pyomo's shell interface. report_timing splits
+        # the call into writing the problem file, the solver run and reading its
+        # output; a CBC log gives the incumbent timeline. Returns the solve status (see solve).
+        solver = SolverFactory(solver_name)
+        option_names = SHELL_SOLVERS[solver_name]
+        for setting, value in (('time_limit', time_limit), ('mip_rel_gap', mip_rel_gap), ('threads', threads)):
+            if value is not None and setting in option_names:
+                solver.options[option_names[setting]] = value
+        log_file, log_path = tempfile.mkstemp(suffix=f'.{solver_name}.log')
+        os.close(log_file)
+        output = CapturedOutput(echo=sys.stdout if tee else None)
+        try:
+            with contextlib.redirect_stdout(output):
+                # GLPK takes no MIP start, only pass warmstart to solvers that do
+                warm = {'warmstart': True} if self.warm_start and solver.warm_start_capable() else {}
+                results = solver.solve(self.model, tee=tee, logfile=log_path, report_timing=True,
+                                       load_solutions=False, **warm)
+            if solver_name == 'cbc':
+                with open(log_path) as f:
+                    self.metrics.record_cbc_log(f.read())
+        finally:
+            os.remove(log_path)
+        self.metrics.record_pyomo_timing(output.getvalue())
+
+        optimal = results.solver.termination_condition == pyomo.TerminationCondition.optimal
+        lower, upper = results.problem.lower_bound, results.problem.upper_bound
+        finite = [isinstance(b, (int, float)) and abs(b) != float('inf') for b in (lower, upper)]
+        # Stopped by a limit, the solver still reports its best integer solution;
+        # without one the upper bound stays infinite and x would have no values to read
+        if len(results.solution) == 0 or not (optimal or finite[1]):
+            infeasible = results.solver.termination_condition == pyomo.TerminationCondition.infeasible
+            status = 'infeasible' if infeasible else 'no_solution'
+        else:
+            status = 'optimal' if optimal else 'feasible'
+            with self.metrics.phase('load'):
+                self.model.solutions.load_from(results)
+        self.bound = lower if finite[0] else None
+        self.mip_gap = abs(upper - lower) / max(abs(upper), 1e-10) if all(finite) else (0.0 if optimal else None)
+        branch_and_bound = getattr(results.solver.statistics, 'branch_and_bound', None)
+        solver_time = getattr(results.solver, 'wallclock_time', None)
+        self.metrics.solver.update(
+            solver=solver_name, interface='shell', termination=str(results.solver.termination_condition),
+            nodes=getattr(branch_and_bound, 'number_of_created_subproblems', None),
+            gap=self.mip_gap, dual_bound=self.bound,
+            # The solver's own run time, the rest of the solve phase is process overhead
+            solver_time=solver_time if isinstance(solver_time, (int, float)) else None,
+        )
+        return status
+
+    def solve_problem(self, tee=False):
+        try:
+            # Solve the VRP problem
+            routes = self.solve(tee=tee)
+
+            # Display results
+            print("\nRESULTS\n")
+
+            print("Goods: ", self.goods_for_cus)
+
+            if routes is not None:
+                # Display the routes
+                print("Total distance traveled:", self.objective)
+                if self.solve_status == 'feasible':
+                    gap = f"{self.mip_gap:.2%}" if self.mip_gap is not None else "unknown"
+                    print(f"Stopped at a limit: best bound {self.bound}, gap {gap}")
+                for k, route in enumerate(routes):
+                    print(f"Vehicle {k + 1} route: {[self.customer_names[i] for i, j in route]}")
+
+                # Plot the routes
+                with self.metrics.phase('plot'):
+                    plot_routes(routes, self.depot, self.customer_locations)
+
+                # Append the request and its solution to the record store
+                input_data = {
+                    "num_customers": self.num_customers,
+                    "num_vehicles": self.num_vehicles,
+                    "num_goods": self.num_goods,
+                    "depot": self.depot,
+                    "customer_locations": self.customer_locations,
+                    "goods_for_cus": self.goods_for_cus,
+                    "vehicle_capacity": self.vehicle_capacity,
+                    "time_for_sent": time_for_sent(self.get_time_windows())
+                }
+                record_solve(input_data, {'status': self.solve_status, 'objective': self.objective, 'gap': self.mip_gap,
+                                          'routes': [[i for i, _ in route] for route in routes]})
+            else:
+                print("Solver did not find a feasible solution. Check the model and solver settings.")
+            print(self.metrics.summary())
+
+        except Exception as e:
+            # Log the exception with its traceback, and keep it in the metrics record
+            logging.exception("An error occurred: %s", str(e))
+            self.metrics.fail(e)
+            self.metrics.emit()
+
+if __name__ == "__main__":
+    # Example usage:
+    num_customers = 5
+    num_vehicles = 2
+    num_goods = 3
+    vrp_solver = VehicleRoutingProblemSolver(num_customers, num_vehicles, num_goods, formulation='two_index')
+    vrp_solver.preprocess()
+    vrp_solver.build_model()
+    vrp_solver.apply_construction_heuristic()
+    vrp_solver.solve_problem()
+
@@ -0,0 +1,218 @@
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from collections import Counter, defaultdict
+
+from pyomo.opt import SolverFactory
+
+from persistentSession import PERSISTENT_SOLVERS, persistent_available
+
+# Backends a portfolio can race, as solver-class options. 'highs' is scipy's
+# HiGHS on the matrix assembly and is always there; 'appsi_highs' needs
+# highspy, the others their executable on the PATH.
+PORTFOLIO_BACKENDS = {
+    'cbc': {'assembly': 'pyomo', 'solver': 'cbc'},
+    'glpk': {'assembly': 'pyomo', 'solver': 'glpk'},
+    'highs': {'assembly': 'matrix'},
+    'appsi_highs': {'assembly': 'pyomo', 'solver': 'highs'},
+}
+
+# Seconds past the deadline to wait for solvers to hand in their incumbents
+REPORT_GRACE = 5.0
+
+# Better statuses win; among equal statuses the lower objective does
+STATUS_RANK = {'optimal': 0, 'feasible': 1, 'infeasible': 2, 'no_solution': 2, 'error': 3, 'killed': 4}
+
+# Statuses that settle the race: an optimum, or a proof that there is none
+CONCLUSIVE = ('optimal', 'infeasible')
+
+# JSON lines of race outcomes for win_statistics()
+STATS_FILE = 'portfolio_stats.jsonl'
+
+logger = logging.getLogger('vrp.portfolio')
+
+
+def available_backends(names=None):
+    # Requested (default: all) backends whose solver is installed here
+    names = list(PORTFOLIO_BACKENDS) if names is None else list(names)
+    found = []
+    for name in names:
+        if name not in PORTFOLIO_BACKENDS:
+            raise ValueError(f"Unknown portfolio backend '{name}', use one of {sorted(PORTFOLIO_BACKENDS)}")
+        solver = PORTFOLIO_BACKENDS[name].get('solver')
+        if solver is None:
+            found.append(name)
+        elif solver in PERSISTENT_SOLVERS:
+            if persistent_available(solver):
+                found.append(name)
+        elif SolverFactory(solver).available(exception_flag=False):
+            found.append(name)
+    return found
+
+
+def instance_profile(vrp):
+    # Features that tend to decide which backend is fastest
+    time_windows = vrp.get_time_windows()
+    widths = sorted(end - start for start, end in time_windows.values())
+    return {
+        'customers': vrp.num_customers,
+        'vehicles': vrp.num_vehicles,
+        'formulation': vrp.formulation,
+        'arc_density': round(len(vrp.arcs) / (len(vrp.nodes) * (len(vrp.nodes) - 1)), 2),
+        'capacity_use': round(sum(vrp.goods_for_cus.values()) / (vrp.num_vehicles * vrp.vehicle_capacity), 2),
+        'window_minutes': widths[len(widths) // 2] if widths else None,
+    }
+
+
+def profile_key(profile):
+    # Coarse bucket for comparing wins across similar instances
+    size = next((f"<={limit}" for limit in (10, 25, 50, 100) if profile['customers'] <= limit), ">100")
+    capacity = 'tight' if profile['capacity_use'] > 0.8 else 'loose'
+    return f"{profile['formulation']}/{size} customers/{capacity} capacity"
+
+
+def race_task(vrp, time_limit, mip_rel_gap):
+    # Everything an entrant needs to rebuild the instance with its own backend,
+    # preprocessed arcs and windows included so every entrant solves vrp's model
+    data = {
+        'depot': vrp.depot,
+        'customer_locations': vrp.customer_locations,
+        'goods_for_cus': vrp.goods_for_cus,
+        'time_windows': vrp.get_time_windows(),
+        'num_vehicles': vrp.num_vehicles,
+        'vehicle_capacity': vrp.vehicle_capacity,
+    }
+    options = {'metric': vrp.metric, 'road_network': vrp.road_network, 'formulation': vrp.formulation,
+               'threads': vrp.threads}
+    return type(vrp), data, options, list(vrp.arcs), vrp.model_windows, vrp.depot_window, time_limit, mip_rel_gap
+
+
+def run_entrant(backend, task, results):
+    # Runs in its own process group, so the race can kill it together with
+    # any solver executable it started
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    solver_class, data, options, arcs, model_windows, depot_window, time_limit, mip_rel_gap = task
+    start = time.perf_counter()
+    try:
+        # A backend's own options (e.g. a formulation) override the instance's
+        sub = solver_class.from_data(**data, **{**options, **PORTFOLIO_BACKENDS[backend]})
+        sub.arcs, sub.model_windows, sub.depot_window = arcs, model_windows, depot_window
+        with contextlib.redirect_stdout(io.StringIO()):
+            sub.build_model()
+            routes = sub.solve(time_limit=time_limit, mip_rel_gap=mip_rel_gap)
+        result = {'status': sub.solve_status, 'objective': sub.objective, 'gap': sub.mip_gap, 'bound': sub.bound,
+                  'routes': [list(route) for route in routes] if routes is not None else None}
+    except Exception as error:
+        result = {'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+    result.update(backend=backend, time=time.perf_counter() - start)
+    results.put(result)
+
+
+def kill(process):
+    if not process.is_alive():
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # Not yet in its own group (or no process groups here)
+        process.kill()
+    process.join()
+
+
+def ranking(result):
+    objective = result.get('objective')
+    return STATUS_RANK[result['status']], objective if objective is not None else float('inf')
+
+
+def race(vrp, backends=None, time_limit=60.0, mip_rel_gap=None, stats_path=STATS_FILE):
+    # Solve vrp on every available backend at once. The first proven optimum
+    # (or proof of infeasibility) ends the race at once; otherwise each solver stops at time_limit with its best
+    # incumbent and the best of those wins. Stragglers are killed. The outcome
+    # is appended to stats_path unless it is None. Returns
+    # {'winner', 'status', 'objective', 'gap', 'bound', 'routes', 'entrants'}.
+    backends = available_backends(backends)
+    if not backends:
+        raise RuntimeError("No portfolio backend is available")
+    task = race_task(vrp, time_limit, mip_rel_gap)
+    results = multiprocessing.Queue()
+    processes = {name: multiprocessing.Process(target=run_entrant, args=(name, task, results), daemon=True)
+                 for name in backends}
+    race_start = time.perf_counter()
+    for process in processes.values():
+        process.start()
+
+    deadline = race_start + (time_limit if time_limit is not None else float('inf')) + REPORT_GRACE
+    entrants = {}
+    try:
+        while len(entrants) < len(processes):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                result = results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                # An entrant that died without reporting (e.g. killed by the OOM killer)
+                for name, process in processes.items():
+                    if name not in entrants and not process.is_alive() and process.exitcode not in (0, None):
+                        entrants[name] = {'backend': name, 'status': 'error', 'error': f"exit code {process.exitcode}"}
+                continue
+            entrants[result['backend']] = result
+            if result['status'] in CONCLUSIVE:
+                break
+    finally:
+        for process in processes.values():
+            kill(process)
+        results.close()
+    for name in processes:
+        entrants.setdefault(name, {'backend': name, 'status': 'killed', 'time': time.perf_counter() - race_start})
+
+    best = min(entrants.values(), key=ranking)
+    found = best['status'] in ('optimal', 'feasible')
+    proven = any(result['status'] == 'infeasible' for result in entrants.values())
+    outcome = {
+        'winner': best['backend'] if found else None,
+        'status': best['status'] if found else 'infeasible' if proven else 'no_solution',
+        'objective': best.get('objective') if found else None,
+        'gap': best.get('gap') if found else None,
+        'bound': best.get('bound') if found else None,
+        'routes': best.get('routes') if found else None,
+        'race_time': time.perf_counter() - race_start,
+        'entrants': {name: {key: value for key, value in result.items() if key != 'routes'}
+                     for name, result in entrants.items()},
+    }
+    record_race(vrp, outcome, stats_path)
+    return outcome
+
+
+def record_race(vrp, outcome, stats_path=STATS_FILE):
+    # One JSON line in stats_path for win_statistics(), and a log line for
+    # loggers that let INFO through
+    profile = instance_profile(vrp)
+    logger.info("Portfolio race (%s): winner %s (%s, objective %s) in %.2fs; %s", profile_key(profile),
+                outcome['winner'], outcome['status'], outcome['objective'], outcome['race_time'],
+                ", ".join(f"{name} {result['status']}" for name, result in outcome['entrants'].items()))
+    if stats_path is not None:
+        record = {'time': time.time(), 'profile': profile, 'winner': outcome['winner'], 'status': outcome['status'],
+                  'entrants': {name: {'status': result['status'], 'time': result.get('time'),
+                                      'objective': result.get('objective')}
+                               for name, result in outcome['entrants'].items()}}
+        with open(stats_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+def win_statistics(stats_path=STATS_FILE):
+    # {profile bucket: {backend: wins}} over every race recorded in stats_path
+    wins = defaultdict(Counter)
+    with open(stats_path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record['winner'] is not None:
+                wins[profile_key(record['profile'])][record['winner']] += 1
+    return {key: dict(counter.most_common()) for key, counter in wins.items()}
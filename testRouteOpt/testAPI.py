@@ -1,9 +1,42 @@
-from flask import Flask, render_template, request
+from flask import Flask, jsonify, render_template, request
 import datetime
-import json
+import os
+from batchSolve import BATCH_BACKENDS, solve_job
+from jobQueue import JobQueue, QueueFull
+from recordStore import open_store
 
 app = Flask(__name__)
 
+# Solver pool behind /process_input, configurable through the environment
+app.config.update(
+    JOB_WORKERS=int(os.environ.get('VRP_JOB_WORKERS', os.cpu_count() or 1)),
+    JOB_EXECUTOR=os.environ.get('VRP_JOB_EXECUTOR', 'process'),
+    JOB_QUEUE_LIMIT=int(os.environ.get('VRP_JOB_QUEUE_LIMIT', 100)),
+    JOB_TIME_LIMIT=float(os.environ.get('VRP_JOB_TIME_LIMIT', 30)),
+    JOB_BACKEND=os.environ.get('VRP_JOB_BACKEND', 'alns'),
+    RECORD_DIR=os.environ.get('VRP_RECORD_DIR', 'records'),
+)
+job_queue = None
+
+
+def get_job_queue():
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue(run_job, app.config['JOB_WORKERS'], app.config['JOB_EXECUTOR'], app.config['JOB_QUEUE_LIMIT'])
+    return job_queue
+
+
+def get_record_store():
+    return open_store(app.config['RECORD_DIR'])
+
+
+def run_job(job_id, input_data, backend, time_limit, record_dir):
+    # Worker side of a queued request, same result record as batchSolve; the
+    # result goes into the record store next to its request
+    result = solve_job((job_id, 'api', input_data, backend, time_limit, 0, {'formulation': 'two_index', 'assembly': 'matrix'}))
+    open_store(record_dir).append_result(result['instance'], result)
+    return result
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -34,11 +67,47 @@ def process_input():
         "time_for_sent": time_windows
     }
 
-    with open('customersAPI.log', 'a') as json_file:
-        json.dump(input_data, json_file)
-        json_file.write('\n')
+    backend = request.form.get('backend', app.config['JOB_BACKEND'])
+    if backend not in BATCH_BACKENDS:
+        return jsonify({'error': f"Unknown backend '{backend}', use one of {list(BATCH_BACKENDS)}"}), 400
+    try:
+        time_limit = float(request.form.get('time_limit', app.config['JOB_TIME_LIMIT']))
+    except ValueError:
+        return jsonify({'error': f"time_limit must be a number of seconds, got '{request.form['time_limit']}'"}), 400
+    if not time_limit > 0:
+        return jsonify({'error': "time_limit must be positive"}), 400
+
+    get_record_store().append_instance(input_data)
+
+    # Hand the solve to the pool and answer right away
+    try:
+        job_id = get_job_queue().submit(input_data, backend, time_limit, app.config['RECORD_DIR'])
+    except QueueFull as error:
+        response = jsonify({'error': str(error)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(time_limit))
+        return response
+
+    response = jsonify({'job_id': job_id, 'status': 'queued'})
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_queue().status(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown job {job_id}"}), 404
+    return jsonify(job)
 
-    return "Data processed successfully!"
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    status = get_job_queue().cancel(job_id)
+    if status is None:
+        return jsonify({'error': f"Unknown job {job_id}"}), 404
+    if status != 'cancelled':
+        return jsonify({'job_id': job_id, 'status': status, 'error': "Job already finished"}), 409
+    return jsonify({'job_id': job_id, 'status': status})
 
 if __name__ == '__main__':
     app.run(debug=True)
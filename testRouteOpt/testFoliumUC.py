@@ -1,13 +1,15 @@
 import pyomo.environ as pyomo
 from pyomo.opt import SolverFactory
-import random
 import logging
 import math
-import json
+import time
 from datetime import datetime
 import sys
-import folium
 from nanoid import generate
+from instanceLoader import instance_from_record, load_instances, time_for_sent
+from recordStore import record_solve
+from routeExtraction import active_indices, ordered_arcs
+from routeRendering import render_map
 
 # Configure logging
 logging.basicConfig(filename='pyomo_ipy.log', level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -43,7 +45,8 @@ def get_user_goods(customer_id):
     #     print("Invalid time input. Use integers for hours and minutes.")
     #     sys.exit(1)
     
-def get_user_input_set():
+def get_user_input_set(num_customers, num_vehicles, num_goods):
+    # Interactive fallback; instanceLoader.load_instances reads the same data from a file
     start_latitude = float(input("Enter the starting latitude: "))
     start_longitude = float(input("Enter the starting longitude: "))
 
@@ -68,91 +71,102 @@ def get_user_input_set():
             'end': {'hour': end_hour, 'minute': end_minute}
         }
 
-    return num_customers, num_vehicles, num_goods, start_point, customer_locations, time_windows
-
-def write_input_data_to_json(input_data):
-    with open('input_data.json', 'a') as json_file:
-        json.dump(input_data, json_file, indent=2)
-
-def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods):
+    return instance_from_record({
+        'num_customers': num_customers,
+        'num_vehicles': num_vehicles,
+        'num_goods': num_goods,
+        'depot': start_point,
+        'customer_locations': customer_locations,
+        'time_for_sent': time_windows,
+    })
+
+def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods, instance=None):
+    # `instance` is an instanceLoader dict (depot, customer_locations, goods_for_cus,
+    # time_windows in minutes, num_vehicles, vehicle_capacity); without one,
+    # positions and windows are asked on the console and goods are random
     try:
-        # Generate random data
+        if instance is None:
+            instance = get_user_input_set(num_customers, num_vehicles, num_goods)
+        num_customers = len(instance['customer_locations'])
+        num_vehicles = instance['num_vehicles']
+        if num_goods is None:
+            num_goods = int(max(instance['goods_for_cus'].values(), default=0)) + 1
+
         customers = range(1, num_customers + 1)
         vehicles = range(num_vehicles)
-        goods = range(num_goods)
 
         # Coordinates of depot and customers
-        depot = (4, 4)
+        depot = instance['depot']
         # Customer names
         customer_names = {i: f"ID_{i}" for i in customers}
-        customer_locations = {i: (random.uniform(0, 10), random.uniform(0, 10)) for i in customers}  # Adjust the range as needed
-        # Generate random integer goods values for each customer
-        unique_goods_values = list(range(num_goods))
-        random.shuffle(unique_goods_values)
-
-        goods_for_cus = {i: unique_goods_values[j % num_goods] for j, i in enumerate(customers)}
+        customer_locations = instance['customer_locations']
+        goods_for_cus = instance['goods_for_cus']
         # Calculate distances between locations
-        distances = {(i, j, k): distance(customer_locations[i], customer_locations[j]) for i in customers for j in customers for k in vehicles if i != j}
+        locations = {0: depot, **customer_locations}
+        distances = {(i, j): distance(locations[i], locations[j]) for i in locations for j in locations if i != j}
+
+        # Time windows in minutes from midnight, converted once by the loader
+        time_windows = instance['time_windows']
+
+        # Arcs between the depot (node 0) and customers
+        nodes = [0] + list(customers)
+        arcs = [(i, j) for i in nodes for j in nodes if i != j]
+        arcs_out = {i: [j for j in nodes if j != i] for i in nodes}
+        arcs_in = {j: [i for i in nodes if i != j] for j in nodes}
+        vehicle_arcs = [(i, j, k) for i, j in arcs if j != 0 for k in vehicles]
+        vehicle_capacity = instance['vehicle_capacity']
+
+        build_start = time.perf_counter()
 
         # Create Pyomo model
         model = pyomo.ConcreteModel()
 
         # Decision Variables
-        model.x = pyomo.Var(customers, customers, vehicles, domain=pyomo.Binary)
-        model.goods = pyomo.Var(customers, vehicles, domain=pyomo.NonNegativeReals)  # New variable for goods carried
-        model.arrival_time = pyomo.Var(customers, vehicles, domain=pyomo.NonNegativeReals)
-
+        model.x = pyomo.Var([(i, j, k) for i, j in arcs for k in vehicles], domain=pyomo.Binary)
+        model.goods = pyomo.Var(customers, vehicles, bounds=(0, vehicle_capacity))  # Goods on board after serving i
+        model.arrival_time = pyomo.Var(customers, vehicles, bounds=lambda m, i, k: time_windows[i])
 
-        # Objective function: Minimize total distance traveled and total goods carried
+        # Objective function: Minimize total distance traveled
         model.obj = pyomo.Objective(
-            expr=(
-                sum(distances[i, j, k] * model.x[i, j, k] for i in customers for j in customers for k in vehicles if i != j) +
-                sum(goods_for_cus[i] * model.goods[i, k] for i in customers for k in vehicles)
-            ),
+            expr=sum(distances[i, j] * model.x[i, j, k] for i, j in arcs for k in vehicles),
             sense=pyomo.minimize
         )
 
         # Ensure that each customer is visited exactly once
-        model.visits_constraint = pyomo.ConstraintList()
-        for i in customers:
-            model.visits_constraint.add(expr=sum(model.x[i, j, k] for j in customers for k in vehicles) == 1)
+        model.visits_constraint = pyomo.Constraint(
+            customers, rule=lambda m, i: sum(m.x[i, j, k] for j in arcs_out[i] for k in vehicles) == 1
+        )
+        model.flow_constraint = pyomo.Constraint(
+            nodes, vehicles, rule=lambda m, i, k: sum(m.x[i, j, k] for j in arcs_out[i]) == sum(m.x[j, i, k] for j in arcs_in[i])
+        )
 
-        # Ensure that each vehicle leaves and arrives at the depot
-        model.depot_constraint = pyomo.ConstraintList()
-        for k in vehicles:
-            model.depot_constraint.add(expr=sum(model.x[i, j, k] for j in customers for k in vehicles) == 1)
+        # Ensure that each vehicle leaves and arrives at the depot at most once
+        model.depot_constraint = pyomo.Constraint(
+            vehicles, rule=lambda m, k: sum(m.x[0, j, k] for j in arcs_out[0]) <= 1
+        )
 
         # Ensure that each vehicle's goods capacity is not exceeded
-        vehicle_capacity = 10  # Example capacity, adjust as needed
-        model.capacity_constraint = pyomo.ConstraintList()
-        for k in vehicles:
-            model.capacity_constraint.add(
-                expr=sum(goods_for_cus[i] * model.goods[i, k] for i in customers) <= vehicle_capacity
-            )
-
-        # Time window constraints
-        model.time_window_constraint = pyomo.ConstraintList()
-        for i in customers:
-            time_window = get_user_input_set(i)
-            for k in vehicles:
-                model.time_window_constraint.add(
-                    model.arrival_time[i, k] >= time_window['start']['hour'] * 60 + time_window['start']['minute']
-                )
-                model.time_window_constraint.add(
-                    model.arrival_time[i, k] <= time_window['end']['hour'] * 60 + time_window['end']['minute']
-                )
-
-        # Arrival time constraints
-        M = 10000  # A large constant to represent infinity
-        for i in customers:
-            for j in customers:
-                for k in vehicles:
-                    if i != j:
-                        model.time_constraint = pyomo.Constraint(
-                            expr=model.arrival_time[i, k] + distances[i, j, k] <= model.arrival_time[j, k] + M * (1 - model.x[i, j, k])
-                        )
+        model.capacity_constraint = pyomo.Constraint(
+            vehicles, rule=lambda m, k: sum(goods_for_cus[i] * m.x[i, j, k] for i in customers for j in arcs_out[i]) <= vehicle_capacity
+        )
+
+        def load_rule(m, i, j, k):
+            if i == 0:
+                return m.goods[j, k] >= goods_for_cus[j] * m.x[i, j, k]
+            return m.goods[j, k] - m.goods[i, k] - vehicle_capacity * m.x[i, j, k] >= goods_for_cus[j] - vehicle_capacity
+        model.load_constraint = pyomo.Constraint(vehicle_arcs, rule=load_rule)
+
+        # Arrival time constraints (time windows are the arrival_time bounds, big-M per arc comes from them)
+        def arrival_time_rule(m, i, j, k):
+            travel = distances[i, j]
+            if i == 0:
+                return m.arrival_time[j, k] >= travel * m.x[i, j, k]
+            big_m = max(0.0, time_windows[i][1] + travel - time_windows[j][0])
+            return m.arrival_time[j, k] - m.arrival_time[i, k] - big_m * m.x[i, j, k] >= travel - big_m
+        model.time_constraint = pyomo.Constraint(vehicle_arcs, rule=arrival_time_rule)
+
+        print(f"Model build time: {time.perf_counter() - build_start:.3f}s")
 
-        
         # Solve the VRP problem
         solver = SolverFactory('cbc')
         results = solver.solve(model, tee=True)
@@ -160,28 +174,32 @@ def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods):
         # Display results
         print("\nRESULTS\n")
 
-        print("Total distance traveled:", sum(distances[i, j, k] + pyomo.value(model.x[i, j, k]) for i in customers for j in customers for k in vehicles if i != j))
         print("Goods: ", goods_for_cus)
         
         if results.solver.termination_condition == pyomo.TerminationCondition.optimal:
-            # Display the routes
-            routes = []
-            for k in vehicles:
-                route = [(i, j) for i in customers for j in customers if pyomo.value(model.x[i, j, k])]
-                routes.append(route)
+            print("Total distance traveled:", pyomo.value(model.obj))
+
+            # Display the routes, in driving order
+            routes = ordered_arcs(active_indices(model.x), 'three_index', num_vehicles)
+            for k, route in enumerate(routes):
                 print(f"Vehicle {k + 1} route: {[customer_names[i] for i, j in route]}")
 
             # Plot the routes on a map using Folium
             plot_routes_on_map(depot, customer_locations, routes)
 
-            # Write input data to JSON file
+            # Append the request and its solution to the record store
             input_data = {
                 "num_customers": num_customers,
                 "num_vehicles": num_vehicles,
                 "num_goods": num_goods,
-                "time_for_sent": {i: get_user_input_set(i) for i in customers}
+                "depot": depot,
+                "customer_locations": customer_locations,
+                "goods_for_cus": goods_for_cus,
+                "vehicle_capacity": vehicle_capacity,
+                "time_for_sent": time_for_sent(time_windows)
             }
-            write_input_data_to_json(input_data)
+            record_solve(input_data, {'status': 'optimal', 'objective': pyomo.value(model.obj),
+                                      'routes': [[i for i, _ in route] for route in routes]})
         else:
             print("Solver did not find an optimal solution. Check the model and solver settings.")
 
@@ -189,45 +207,25 @@ def solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods):
         # Log the exception
         logging.error("An error occurred: %s", str(e))
 
-def plot_routes_on_map(depot, customer_locations, routes):
-    # Create a Folium map centered around the depot
-    map_center = depot
-    route_map = folium.Map(location=map_center, zoom_start=14)
-
-    # Add markers for the depot and customers
-    folium.Marker(depot, popup='Depot', icon=folium.Icon(color='black', icon='home')).add_to(route_map)
-    for customer, location in customer_locations.items():
-        folium.Marker(location, popup=f'Customer {customer}', icon=folium.Icon(color='red', icon='user')).add_to(route_map)
-
-    # Draw lines for each route
-    for k, route in enumerate(routes):
-        color = get_color(k)
-        coordinates = [depot] + [customer_locations[i] for i, j in route] + [depot]
-        folium.PolyLine(coordinates, color=color, weight=2.5, opacity=1).add_to(route_map)
-
-    # Save the map to an HTML file
-    route_map.save('vehicle_routes_map.html')
-
-def get_color(index):
-    # Define colors for different routes
-    colors = ['red', 'blue', 'green', 'purple', 'orange', 'pink', 'brown', 'gray', 'olive', 'cyan']
-    return colors[index % len(colors)]
+def plot_routes_on_map(depot, customer_locations, routes, path='vehicle_routes_map.html'):
+    # One GeoJSON layer for the routes and one marker cluster for the customers
+    # (see routeRendering.render_map), saved to `path`
+    return render_map(routes, depot, customer_locations, path)
 
 if __name__ == "__main__":
+    if len(sys.argv) in (2, 3):
+        # python testFoliumUC.py instance.json|instance.csv [num_vehicles]
+        num_vehicles = int(sys.argv[2]) if len(sys.argv) == 3 else None
+        for instance in load_instances(sys.argv[1], num_vehicles=num_vehicles):
+            solve_vehicle_routing_problem(None, None, None, instance)
+        sys.exit(0)
     if len(sys.argv) != 4:
         print("Usage: python script.py num_customers num_vehicles num_goods")
+        print("   or: python script.py instance.json|instance.csv [num_vehicles]")
         sys.exit(1)
 
     num_customers = int(sys.argv[1])
     num_vehicles = int(sys.argv[2])
     num_goods = int(sys.argv[3])
 
-    # Comment out the following lines
-    # num_customers, num_vehicles, num_goods, time_windows = get_user_input_set()
-    # depot, customer_locations, goods_for_cus, distances = generate_random_data(num_customers, num_vehicles, num_goods)
-
-    # Replace with the function call
-    num_customers, num_vehicles, num_goods, time_windows, start_location, customer_locations = get_user_input_set()
-
-    # Rest of your code remains unchanged
     solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods)
@@ -1,10 +1,10 @@
 import logging
 import math
+import matplotlib
 import matplotlib.pyplot as plt
 from datetime import datetime
 import sys
-import json
-from solveRoute import *
+from routeRendering import NON_INTERACTIVE_BACKENDS, draw_routes
 
 # Configure logging
 logging.basicConfig(filename='pyomo_ipy.log', level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,11 +31,6 @@ def get_user_input_time(customer_id):
         print("Invalid time input. Use integers for hours and minutes.")
         sys.exit(1)
         
-def write_input_data_to_json(input_data):
-    with open('input_data.json', 'a') as json_file:
-        json.dump(input_data, json_file)
-        json_file.write('\n')
-        
 def get_position(customer_id):
     
     lat = float(input(f"Enter latitude for customer {customer_id}: " ))
@@ -45,49 +40,30 @@ def get_position(customer_id):
         
 
 # Plot routes
-def plot_routes(routes, depot, customer_locations):
-    plt.figure(figsize=(10, 10))
-
-    # Plot depot
-    plt.scatter(*depot, color='black', marker='D', s=100, label='Depot')
-
-    # Plot customer nodes
-    for customer, (x, y) in customer_locations.items():
-        plt.scatter(x, y, color='blue')
-        plt.text(x, y, f"ID_{customer}", fontsize=8, ha='right')
-    
-    # Define colors for different vehicles
-    colors = ['aquamarine', 'coral', 'lime', 'salmon', 'khaki', 'orchid', 
-              'peru', 'slate', 'tomato', 'wheat', 'azure', 'bisque', 'cadetblue', 
-              'darkorchid', 'firebrick', 'goldenrod', 'limegreen', 'navajowhite',
-              'rosybrown', 'seagreen']
-
-    # Plot routes
-    for k, route in enumerate(routes):
-        color = colors[k % len(colors)]  # Cycle through colors for each vehicle
-
-        # Start the route from the depot
-        x_values = [depot[0]] + [customer_locations[i][0] for i, j in route] + [depot[0]]
-        y_values = [depot[1]] + [customer_locations[i][1] for i, j in route] + [depot[1]]
-
-        plt.plot(x_values, y_values, color=color, marker='o')
-        plt.plot([], [], color=color, label=f'Vehicle {k + 1} route')
-    # Add legend outside the plot
-    
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper right')
-    plt.title('Vehicle Routes')
-    plt.xlabel('X-coordinate')
-    plt.ylabel('Y-coordinate')
-    plt.legend()
-    plt.show()
+def plot_routes(routes, depot, customer_locations, path=None):
+    # Drawn in one pass (see routeRendering.draw_routes). With path the figure is
+    # saved; otherwise it is shown, unless the backend is headless (nothing to block on).
+    fig, ax = plt.subplots(figsize=(10, 10))
+    draw_routes(ax, routes, depot, customer_locations)
+    if path is not None:
+        fig.savefig(path)
+    elif matplotlib.get_backend().lower() not in NON_INTERACTIVE_BACKENDS:
+        plt.show()
+    plt.close(fig)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python script.py num_customers num_vehicles num_goods")
+    # --min-fleet solves with the fewest vehicles that serve every customer;
+    # num_vehicles then only sizes the random layout
+    minimize_vehicles = '--min-fleet' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--min-fleet']
+    if len(args) != 3:
+        print("Usage: python script.py num_customers num_vehicles num_goods [--min-fleet]")
         sys.exit(1)
 
-    num_customers = int(sys.argv[1])
-    num_vehicles = int(sys.argv[2])
-    num_goods = int(sys.argv[3])
+    num_customers = int(args[0])
+    num_vehicles = int(args[1])
+    num_goods = int(args[2])
 
-    solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods)
+    # Imported here: solveRoute imports this module's helpers at load time
+    from solveRoute import solve_vehicle_routing_problem
+    solve_vehicle_routing_problem(num_customers, num_vehicles, num_goods, minimize_vehicles=minimize_vehicles)